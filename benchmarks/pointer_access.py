@@ -0,0 +1,52 @@
+"""
+Microbenchmark for the json pointer access of tools, compares the uncached
+jsonpointer resolution (as done before the pointer cache) with Tool.access,
+Tool.setValue and Tool.substitute.
+
+Run with: python benchmarks/pointer_access.py
+"""
+
+import os
+import sys
+import timeit
+
+import jsonpointer
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+from experimentrun import framework
+from experimentrun import tools
+
+
+def main(number=100000):
+    config = {
+        "run": {"solver": {"options": {"seed": 1, "timeout": 60}}},
+        "instances": [{"name": "a"}, {"name": "b"}],
+    }
+    context = tools.Tool()
+    context.setup(framework.Metadata(config))
+
+    path = "/run/solver/options/seed"
+    command = "solver --seed ${/run/solver/options/seed} " \
+        "--timeout ${/run/solver/options/timeout} ${/instances/1/name}"
+
+    cases = [
+        ("uncached resolve",
+         lambda: jsonpointer.JsonPointer(path).resolve(config)),
+        ("Tool.access",
+         lambda: context.access(path)),
+        ("Tool.access (list)",
+         lambda: context.access("/instances/1/name")),
+        ("Tool.setValue",
+         lambda: context.setValue("/run/info/time", 1)),
+        ("Tool.substitute (3 pointers)",
+         lambda: context.substitute(command)),
+    ]
+
+    for name, function in cases:
+        seconds = min(timeit.repeat(function, number=number, repeat=3))
+        print("%-30s %8.3f us per call" % (name, seconds / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Microbenchmark for running the tools of exploded configurations, compares
+parsing and locating every tool string on each run (as done before tool
+strings were compiled) with the cached compileToolString.
+
+Run with: python benchmarks/tool_strings.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+from experimentrun import framework
+
+
+toolStrings = [
+    "experimentrun.tools.Tool()",
+    "experimentrun.tools.ExceptionToConfigAndCancelToolExecution"
+    "{'filename': None}",
+    "experimentrun.tools.Eval()",
+]
+
+
+def bootstrap():
+    framework.bootstrap({"tools": list(toolStrings), "v": 1}, "/")
+
+
+def bootstrapUncompiled():
+    # forget the parsed strings and located classes of the last run
+    framework.compileToolString.cache_clear()
+    framework._locatedClasses.clear()
+    bootstrap()
+
+
+def main(number=10000):
+    cases = [
+        ("parse on every run", bootstrapUncompiled),
+        ("compiled once", bootstrap),
+    ]
+
+    for name, function in cases:
+        seconds = min(timeit.repeat(function, number=number, repeat=3))
+        print("%-30s %8.3f us per bootstrap" % (name, seconds / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import logging
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from experimentrun import framework
 from experimentrun import json_names
+from experimentrun import config_cache
 
 
 def main():
@@ -31,12 +32,54 @@ def main():
         help='List of folders to add to path.',
         default=list()
     )
+    parser.add_argument(
+        '-s', '--shard',
+        help="Only run the k-th of n shares of the exploded configurations, "
+             "given as k/n with 1 <= k <= n. Starting the same benchmark "
+             "with all k splits the work without any coordination.",
+        default=None
+    )
+    parser.add_argument(
+        '-j', '--journal',
+        help="Record dispatched and completed configurations in this file.",
+        default=None
+    )
+    parser.add_argument(
+        '-r', '--resume',
+        help="Only run the configurations that are not recorded as "
+             "completed in the journal. The results of the completed "
+             "configurations are not loaded, so ExplodeNBootstrap needs a "
+             "resultSink file.",
+        action="store_true",
+        default=False
+    )
+    parser.add_argument(
+        '-c', '--cacheDir',
+        help="Keep parsed configuration and linked files in this directory "
+             "to speed up later runs. Entries are invalidated when any of "
+             "the files change.",
+        default=None
+    )
     args = parser.parse_args()
 
+    if args.shard is not None:
+        try:
+            framework.parseShard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.resume and args.journal is None:
+        parser.error("--resume requires a --journal to resume from.")
+
     logging.basicConfig(level=args.loglevel)
 
+    loadConfig = None
+    if args.cacheDir is not None:
+        loadConfig = config_cache.ConfigCache(args.cacheDir).load
+
     try:
-        framework.exrun(args.json, args.include)
+        framework.exrun(
+            args.json, args.include, args.shard,
+            args.journal, args.resume, loadConfig)
     except Exception as e:
         logging.warn("Ups, it seems like something went wrong. Pleas check the error output, if it doesn't help you can use -d to get debug output including a trace.")
         if (args.loglevel == logging.DEBUG):
@@ -0,0 +1,130 @@
+import os
+import re
+import gzip
+import threading
+import selectors
+
+
+def _number(text):
+    """Converts text to int or float if possible."""
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+class Extractor(object):
+    """Searches each line for pattern and keeps the last match as value.
+       The value is the first group of the pattern (or the whole match if
+       it has none), converted to a number if possible."""
+    def __init__(self, pointer, pattern):
+        self.pointer = pointer
+        self.regex = re.compile(pattern)
+        self.value = None
+        self.found = False
+
+    def search(self, line):
+        match = self.regex.search(line)
+        if match is not None:
+            self.value = _number(match.group(1 if self.regex.groups else 0))
+            self.found = True
+
+
+class CapturedStream(object):
+    """Output of one pipe. The output is written to filename (gzip
+       compressed if it ends with .gz) until limit bytes of output, the
+       rest is dropped. Without filename the output is passed on to the
+       file descriptor forward. Complete lines are given to extractors."""
+    # longer lines are cut for the extractors, to bound the memory needed
+    maxLineLength = 64 * 1024
+
+    def __init__(self, pipe, filename=None, limit=None, forward=None,
+                 extractors=()):
+        self.pipe = pipe
+        self.limit = limit
+        self.forward = forward
+        self.extractors = list(extractors)
+        self.size = 0
+        self.partial = b""
+        self.file = None
+        if filename is not None:
+            if filename.endswith(".gz"):
+                self.file = gzip.open(filename, 'wb', compresslevel=6)
+            else:
+                self.file = open(filename, 'wb')
+
+    @property
+    def truncated(self):
+        return self.file is not None and self.limit is not None \
+            and self.size > self.limit
+
+    def write(self, data):
+        if self.file is not None:
+            if self.limit is None:
+                self.file.write(data)
+            elif self.size < self.limit:
+                self.file.write(data[:self.limit - self.size])
+        elif self.forward is not None:
+            view = memoryview(data)
+            while len(view) > 0:
+                view = view[os.write(self.forward, view):]
+        self.size += len(data)
+
+        if len(self.extractors) > 0:
+            lines = (self.partial + data).split(b"\n")
+            self.partial = lines.pop()[:self.maxLineLength]
+            for line in lines:
+                self.extract(line)
+
+    def extract(self, line):
+        text = line[:self.maxLineLength].decode("utf-8", errors="replace")
+        for extractor in self.extractors:
+            extractor.search(text)
+
+    def close(self):
+        if len(self.partial) > 0:
+            self.extract(self.partial)
+            self.partial = b""
+        if self.file is not None:
+            self.file.close()
+        self.pipe.close()
+
+
+class OutputCapture(threading.Thread):
+    """Reads the captured streams of a process on a background thread, so
+       the process never blocks on a full pipe."""
+    chunkSize = 64 * 1024
+
+    def __init__(self, streams):
+        super().__init__(daemon=True)
+        self.streams = list(streams)
+        self.stopped = threading.Event()
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        for stream in self.streams:
+            selector.register(stream.pipe, selectors.EVENT_READ, stream)
+
+        numOpen = len(self.streams)
+        while numOpen > 0 and not self.stopped.is_set():
+            for key, events in selector.select(timeout=0.1):
+                data = os.read(key.fd, self.chunkSize)
+                if len(data) == 0:
+                    selector.unregister(key.fileobj)
+                    numOpen -= 1
+                else:
+                    key.data.write(data)
+        selector.close()
+
+    def close(self, timeout=1.0):
+        """Waits until all output is read and closes the streams. Children
+           of the process may keep the pipes open, after timeout seconds
+           their further output is dropped."""
+        self.join(timeout)
+        if self.is_alive():
+            self.stopped.set()
+            self.join()
+        for stream in self.streams:
+            stream.close()
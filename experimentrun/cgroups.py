@@ -0,0 +1,260 @@
+"""cgroup v2 backend for RunShell. Each command runs in its own cgroup
+below the cgroup delegated to this process, limits and accounting cover
+the whole process tree of the command.
+
+Check if the backend works on this machine with
+
+    python -m experimentrun.cgroups
+
+Without root the cgroup has to be delegated, p.a. by running in a
+systemd scope: systemd-run --user --scope -p Delegate=yes python ...
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+
+cgroupRoot = "/sys/fs/cgroup"
+controllers = ("cpu", "memory", "pids")
+# period of cpu.max in microseconds
+cpuPeriod = 100000
+
+
+class CgroupError(Exception):
+    pass
+
+
+def ownCgroup(root=cgroupRoot):
+    """Returns the directory of the cgroup v2 of this process."""
+    with open("/proc/self/cgroup") as cgroupFile:
+        for line in cgroupFile:
+            hierarchy, names, path = line.rstrip("\n").split(":", 2)
+            if hierarchy == "0" and names == "":
+                return os.path.join(root, path.lstrip("/"))
+    raise CgroupError("This process is not in a cgroup v2 hierarchy.")
+
+
+def _read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def _write(path, value):
+    with open(path, 'w') as file:
+        file.write(value)
+
+
+def _readKeyed(path):
+    """Reads a flat keyed file like cpu.stat into a dict of ints."""
+    values = dict()
+    for line in _read(path).splitlines():
+        key, value = line.split()
+        values[key] = int(value)
+    return values
+
+
+class Cgroup(object):
+    """The cgroup of a single job."""
+    def __init__(self, path):
+        self.path = path
+        os.mkdir(path)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def setLimits(self, memoryMax=None, pidsMax=None, cpus=None,
+                  swapMax=None):
+        """Sets the limits of the job, memory in bytes, cpus as (fraction
+           of) number of cpus."""
+        if memoryMax is not None:
+            _write(self.file("memory.max"), str(int(memoryMax)))
+        if swapMax is not None:
+            _write(self.file("memory.swap.max"), str(int(swapMax)))
+        if pidsMax is not None:
+            _write(self.file("pids.max"), str(int(pidsMax)))
+        if cpus is not None:
+            _write(self.file("cpu.max"),
+                   "%d %d" % (int(cpus * cpuPeriod), cpuPeriod))
+
+    def joinFunction(self):
+        """Returns a function moving the calling process into the cgroup,
+           to be called in the child before exec. The file is opened in
+           advance, so the child only writes."""
+        procs = os.open(self.file("cgroup.procs"), os.O_WRONLY)
+
+        def join():
+            os.write(procs, b"0")
+        return join, procs
+
+    def pids(self):
+        return [int(pid) for pid in _read(self.file("cgroup.procs")).split()]
+
+    def populated(self):
+        return _readKeyed(self.file("cgroup.events")).get("populated", 0) != 0
+
+    def kill(self):
+        """Kills all processes of the cgroup, including those that left the
+           process group of the command."""
+        if os.path.exists(self.file("cgroup.kill")):
+            _write(self.file("cgroup.kill"), "1")
+            return
+        # kernels before 5.14, new processes may appear while killing
+        for i in range(100):
+            pids = self.pids()
+            if len(pids) == 0:
+                return
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def stats(self):
+        """Returns the cpu and memory accounting of the cgroup, times in
+           seconds and sizes in bytes."""
+        stats = dict()
+        cpu = _readKeyed(self.file("cpu.stat"))
+        stats["cgroupCpuTime"] = cpu.get("usage_usec", 0) / 1e6
+        stats["cgroupUserTime"] = cpu.get("user_usec", 0) / 1e6
+        stats["cgroupSystemTime"] = cpu.get("system_usec", 0) / 1e6
+        if "throttled_usec" in cpu:
+            stats["cgroupThrottledTime"] = cpu["throttled_usec"] / 1e6
+
+        # memory.peak is available since linux 5.19
+        if os.path.exists(self.file("memory.peak")):
+            stats["cgroupMemoryPeak"] = int(_read(self.file("memory.peak")))
+        if os.path.exists(self.file("memory.events")):
+            events = _readKeyed(self.file("memory.events"))
+            stats["cgroupMemoryEvents"] = events
+            stats["oomKilled"] = events.get("oom_kill", 0) > 0
+        if os.path.exists(self.file("pids.events")):
+            stats["cgroupPidsMaxReached"] = \
+                _readKeyed(self.file("pids.events")).get("max", 0) > 0
+        return stats
+
+    def remove(self, timeout=1.0):
+        """Kills the remaining processes and removes the cgroup."""
+        self.kill()
+        end = time.monotonic() + timeout
+        while self.populated() and time.monotonic() < end:
+            time.sleep(0.001)
+        try:
+            os.rmdir(self.path)
+        except OSError as e:
+            logging.warning("Could not remove cgroup %s: %s" % (self.path, e))
+
+
+class CgroupManager(object):
+    """Creates the cgroups of jobs below base, the cgroup delegated to this
+       process (by default its own). As processes may only be in leaf
+       cgroups when controllers are enabled, this process is moved to the
+       child cgroup supervisor first and the jobs are created in the child
+       cgroup jobs. Other processes must not be in base, run in a cgroup
+       of its own, p.a. a systemd scope."""
+    def __init__(self, base=None):
+        if base is None:
+            base = os.environ.get("EXRUN_CGROUP_BASE", None)
+        if base is None:
+            base = ownCgroup()
+        self.base = base
+        self.pid = os.getpid()
+        self.supervisor = os.path.join(base, "exrun-supervisor")
+        self.jobs = os.path.join(base, "exrun-jobs")
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.setup()
+
+    def setup(self):
+        if not os.path.exists(os.path.join(self.base, "cgroup.controllers")):
+            raise CgroupError("%s is not a cgroup v2." % (self.base))
+        available = _read(
+            os.path.join(self.base, "cgroup.controllers")).split()
+        missing = [name for name in controllers if name not in available]
+        if len(missing) > 0:
+            raise CgroupError("Controllers %s are not delegated to %s."
+                              % (", ".join(missing), self.base))
+
+        try:
+            os.makedirs(self.supervisor, exist_ok=True)
+            os.makedirs(self.jobs, exist_ok=True)
+            _write(os.path.join(self.supervisor, "cgroup.procs"),
+                   str(os.getpid()))
+            enable = " ".join("+" + name for name in controllers)
+            _write(os.path.join(self.base, "cgroup.subtree_control"), enable)
+            _write(os.path.join(self.jobs, "cgroup.subtree_control"), enable)
+        except OSError as e:
+            raise CgroupError(
+                "Can not set up cgroups in %s (is it delegated to this "
+                "user and are there no other processes in it?): %s"
+                % (self.base, e))
+
+    def forked(self):
+        """Continues using the hierarchy in a forked child process."""
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def createJob(self):
+        with self.lock:
+            self.counter += 1
+            name = "job-%d-%d" % (os.getpid(), self.counter)
+        return Cgroup(os.path.join(self.jobs, name))
+
+
+_manager = None
+_managerLock = threading.Lock()
+
+
+def _resetManagerLock():
+    global _managerLock
+    _managerLock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_resetManagerLock)
+
+
+def manager():
+    """Returns the CgroupManager of this process, created on first use.
+       Forked processes use the hierarchy of their parent, so create it
+       before forking workers."""
+    global _manager
+    with _managerLock:
+        if _manager is None:
+            _manager = CgroupManager()
+        elif _manager.pid != os.getpid():
+            _manager.forked()
+        return _manager
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    try:
+        cgroupManager = manager()
+        print("Using cgroup %s." % (cgroupManager.base))
+        job = cgroupManager.createJob()
+        job.setLimits(memoryMax=256 * 2 ** 20, pidsMax=64, cpus=1)
+        join, procs = job.joinFunction()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                join()
+                os.execvp("true", ["true"])
+            finally:
+                os._exit(127)
+        os.close(procs)
+        pid, status = os.waitpid(pid, 0)
+        print("Test job exited with %d, accounting:"
+              % (os.waitstatus_to_exitcode(status)))
+        for key, value in job.stats().items():
+            print("    %s: %s" % (key, value))
+        job.remove()
+    except (CgroupError, OSError) as e:
+        print("cgroup v2 backend not available: %s" % (e))
+        return 1
+    print("cgroup v2 backend works.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
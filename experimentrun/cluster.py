@@ -0,0 +1,330 @@
+import time
+import uuid
+import logging
+import threading
+
+import Pyro4
+
+from collections import deque
+
+from . import framework
+
+
+def _asyncProxy(proxy):
+    """Makes calls of proxy asynchronous, Pyro4 4.53 renamed Pyro4.async
+       as async is a reserved word since python 3.7."""
+    if hasattr(proxy, "_pyroAsync"):
+        proxy._pyroAsync()
+    else:
+        getattr(Pyro4, 'async')(proxy)
+    return proxy
+
+
+class _ClusterJob(object):
+    """A job waiting for or running on a remote dispatcher."""
+    def __init__(self, onResult, config=None, cwd=None, templateKey=None,
+                 template=None, index=None, configPath=None):
+        self.onResult = onResult
+        self.config = config
+        self.cwd = cwd
+        self.templateKey = templateKey
+        self.template = template
+        self.index = index
+        self.configPath = configPath
+        self.attempts = 0
+        self.error = None
+
+    def request(self, remoteKey, upload):
+        """Returns the [method, args] entry of the job for runBatch."""
+        if self.templateKey is None:
+            return ["run", [self.config, self.cwd, self.configPath]]
+        return ["runIndexed", [
+            remoteKey, self.template if upload else None, self.index,
+            self.cwd, self.configPath]]
+
+
+class ClusterDispatcher(object):
+    """Runs jobs on the remote JobDispatchers registered at the name
+       server. Jobs are queued and sent in batches (runBatch), the batch
+       size is chosen from the observed job durations so a batch takes
+       about batchTime seconds, at most maxBatch jobs. Besides the running
+       batch prefetch further batches wait at each dispatcher, so it never
+       waits for the next round trip.
+
+       The name server is queried every discoveryInterval seconds,
+       dispatchers that joined or came back are used after they answered
+       a ping within healthTimeout seconds. A dispatcher is dropped when a
+       call to it fails and its jobs are queued again. A job is tried at
+       most maxAttempts times. If there is no dispatcher for
+       capacityTimeout seconds while jobs are left, RuntimeError is
+       raised."""
+    def __init__(self, resultStorage, batchTime=0.5, maxBatch=64,
+                 prefetch=1, discoveryInterval=30.0, healthTimeout=10.0,
+                 maxAttempts=3, capacityTimeout=120.0):
+        self.resultStorage = resultStorage
+        self.storageLock = threading.Lock()
+        self.batchTime = batchTime
+        self.maxBatch = maxBatch
+        self.prefetch = prefetch
+        self.discoveryInterval = discoveryInterval
+        self.healthTimeout = healthTimeout
+        self.maxAttempts = maxAttempts
+        self.capacityTimeout = capacityTimeout
+
+        logging.getLogger("Pyro4").setLevel(logging.WARN)
+        logging.getLogger("Pyro4.core").setLevel(logging.WARN)
+        self.aviableDispatchers = set()
+        # uri of each available dispatcher
+        self.uris = dict()
+        # number of batches sent to each dispatcher and not finished
+        self.outstanding = dict()
+        # keys of the templates each dispatcher confirmed to have,
+        # dispatchers may be shared with other clients so keys are
+        # prefixed by ours
+        self.uploadedTemplates = dict()
+        self.clientId = uuid.uuid4().hex
+        self.pending = deque()
+        self.failedJobs = list()
+        # moving average of the job duration, None until the first result
+        self.jobDuration = None
+        self.noCapacitySince = None
+        self.storeError = None
+
+        self.cv = threading.Condition()
+        self.discover(required=True)
+        self.stopped = threading.Event()
+        self.rediscover = threading.Event()
+        self.discoveryThread = threading.Thread(
+            target=self.discoveryLoop, daemon=True)
+        self.discoveryThread.start()
+
+    def healthy(self, uri):
+        """Pings the dispatcher at uri and sends it our includes."""
+        try:
+            with Pyro4.Proxy(uri) as proxy:
+                proxy._pyroTimeout = self.healthTimeout
+                proxy.ping()
+                proxy.setIncludes(framework.includes)
+        except Exception as e:
+            logging.debug("Dispatcher %s is not available: %s" % (uri, e))
+            return False
+        return True
+
+    def discover(self, required=False):
+        """Adds the healthy dispatchers registered at the name server that
+           are not used yet. If required errors of the name server are
+           raised."""
+        try:
+            ns = Pyro4.locateNS()
+            lookup = ns.list(metadata_all={"jobdispatcher"})
+        except Exception as e:
+            if required:
+                raise
+            logging.warning("Can not query the name server: %s" % (e))
+            return
+
+        with self.cv:
+            known = set(self.uris.values())
+        for name, uri in lookup.items():
+            uri = str(uri)
+            if uri in known or not self.healthy(uri):
+                continue
+            proxy = _asyncProxy(Pyro4.Proxy(uri))
+            with self.cv:
+                logging.info("Using dispatcher %s." % (name))
+                self.aviableDispatchers.add(proxy)
+                self.uris[proxy] = uri
+                self.outstanding[proxy] = 0
+                self.uploadedTemplates[proxy] = set()
+                self.cv.notify_all()
+
+    def discoveryLoop(self):
+        while not self.stopped.is_set():
+            self.rediscover.wait(self.discoveryInterval)
+            self.rediscover.clear()
+            if self.stopped.is_set():
+                return
+            self.discover()
+            self.schedule()
+
+    def close(self):
+        """Stops the discovery of dispatchers."""
+        self.stopped.set()
+        self.rediscover.set()
+
+    def store(self, result, onResult=None):
+        with self.storageLock:
+            if onResult is None:
+                self.resultStorage.append(result)
+            else:
+                onResult(result)
+
+    def batchSize(self):
+        """Number of jobs for the next batch, needs self.cv."""
+        if self.jobDuration is None:
+            size = 1
+        else:
+            size = int(self.batchTime / max(self.jobDuration, 1e-6))
+        # leave work for the other dispatchers at the end of a run
+        numDispatchers = max(1, len(self.aviableDispatchers))
+        fairShare = -(-len(self.pending) // numDispatchers)
+        return max(1, min(size, self.maxBatch, fairShare))
+
+    def schedule(self):
+        """Sends batches to the dispatchers with room for one."""
+        batches = list()
+        with self.cv:
+            for dispatcher in self.aviableDispatchers:
+                while len(self.pending) > 0 and \
+                        self.outstanding[dispatcher] <= self.prefetch:
+                    size = self.batchSize()
+                    batch = [self.pending.popleft() for i in range(size)]
+                    self.outstanding[dispatcher] += 1
+                    batches.append((dispatcher, batch))
+        for dispatcher, batch in batches:
+            self.send(dispatcher, batch)
+
+    def send(self, dispatcher, batch):
+        # asynchronous calls may arrive out of order, so templates are sent
+        # until a batch with them finished
+        uploaded = set(self.uploadedTemplates[dispatcher])
+        requests = list()
+        for job in batch:
+            job.attempts += 1
+            remoteKey = "%s-%s" % (self.clientId, job.templateKey)
+            requests.append(
+                job.request(remoteKey, job.templateKey not in uploaded))
+        try:
+            future = dispatcher.runBatch(requests)
+        except Exception as e:
+            self.handleException(e, dispatcher, batch)
+            return
+        future \
+            .then(self.finishBatch, dispatcher, batch) \
+            .iferror(
+                (lambda dispatcher, batch:
+                 lambda x: self.handleException(x, dispatcher, batch)
+                )(dispatcher, batch)
+            )
+
+    def finishBatch(self, outcomes, dispatcher, batch):
+        failed = list()
+        unknown = list()
+        for job, (status, result, duration) in zip(batch, outcomes):
+            if status == "ok":
+                try:
+                    self.store(result, job.onResult)
+                except Exception as e:
+                    # raised by wait, an error here would count as failure
+                    # of the dispatcher
+                    with self.cv:
+                        self.storeError = e
+            elif status == "unknownTemplate":
+                # the dispatcher evicted the template, it is uploaded again
+                # and the job did not really run
+                job.attempts -= 1
+                unknown.append(job)
+            else:
+                logging.error("Got Remote Exception: " + str(result))
+                job.error = result
+                failed.append(job)
+            with self.cv:
+                if status == "unknownTemplate":
+                    self.uploadedTemplates[dispatcher].discard(job.templateKey)
+                    continue
+                if self.jobDuration is None:
+                    self.jobDuration = duration
+                else:
+                    self.jobDuration = 0.7 * self.jobDuration + 0.3 * duration
+                if status == "ok" and job.templateKey is not None:
+                    self.uploadedTemplates[dispatcher].add(job.templateKey)
+
+        with self.cv:
+            self.outstanding[dispatcher] -= 1
+            self.retry(unknown + failed)
+            self.cv.notify_all()
+        self.schedule()
+
+    def handleException(self, exception, dispatcher, batch):
+        """The call failed as a whole, the dispatcher is dropped until the
+           discovery finds it healthy again."""
+        logging.error("Got Remote Exception: " + str(exception))
+        with self.cv:
+            self.outstanding[dispatcher] -= 1
+            if dispatcher in self.aviableDispatchers:
+                logging.warning("Dropping dispatcher %s."
+                                % (self.uris[dispatcher]))
+                self.aviableDispatchers.discard(dispatcher)
+                del self.uris[dispatcher]
+            for job in batch:
+                job.error = str(exception)
+            self.retry(batch)
+            self.cv.notify_all()
+        self.rediscover.set()
+        self.schedule()
+
+    def retry(self, jobs):
+        """Queues jobs again, in front of the others, unless they were
+           tried maxAttempts times. Needs self.cv."""
+        for job in reversed(jobs):
+            if job.attempts < self.maxAttempts:
+                self.pending.appendleft(job)
+            else:
+                self.failedJobs.append(job)
+
+    def checkCapacity(self):
+        """Raises RuntimeError if no dispatcher was available for
+           capacityTimeout seconds, needs self.cv."""
+        if len(self.aviableDispatchers) > 0:
+            self.noCapacitySince = None
+            return
+        now = time.monotonic()
+        if self.noCapacitySince is None:
+            self.noCapacitySince = now
+        elif now - self.noCapacitySince > self.capacityTimeout:
+            raise RuntimeError(
+                "No job dispatcher available for %d seconds, %d jobs were "
+                "not run." % (self.capacityTimeout, len(self.pending)))
+
+    def submit(self, job):
+        with self.cv:
+            # bound the queue, jobs are journaled as dispatched when
+            # they are submitted
+            while len(self.pending) >= 2 * self.maxBatch * \
+                    max(1, len(self.aviableDispatchers)):
+                self.checkCapacity()
+                self.cv.wait(1.0)
+            self.pending.append(job)
+        self.schedule()
+
+    def run(self, config, cwd, onResult=None, configPath=None):
+        """Runs config on the next free dispatcher. The result is stored to
+           resultStorage or, if given, passed to onResult."""
+        self.submit(_ClusterJob(
+            onResult, config=config, cwd=cwd, configPath=configPath))
+
+    def runIndexed(self, templateKey, template, index, cwd, configPath,
+                   onResult=None):
+        """Runs the exploded configuration index of template on the next
+           free dispatcher. The template is uploaded only once to each
+           dispatcher, afterwards only its key and the index are sent."""
+        self.submit(_ClusterJob(
+            onResult, cwd=cwd, templateKey=templateKey, template=template,
+            index=index, configPath=configPath))
+
+    def wait(self):
+        """Waits until all jobs finished. Raises RuntimeError if jobs
+           failed maxAttempts times or could not be run."""
+        with self.cv:
+            while len(self.pending) > 0 or \
+                    any(count > 0 for count in self.outstanding.values()):
+                if len(self.pending) > 0:
+                    self.checkCapacity()
+                self.cv.wait(1.0)
+            if self.storeError is not None:
+                raise self.storeError
+            if len(self.failedJobs) > 0:
+                raise RuntimeError(
+                    "%d jobs failed after %d attempts, last error: %s"
+                    % (len(self.failedJobs), self.maxAttempts,
+                       self.failedJobs[-1].error))
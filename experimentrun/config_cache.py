@@ -0,0 +1,137 @@
+import os
+import sys
+import marshal
+import hashlib
+import logging
+import tempfile
+
+from . import framework
+from . import json_names
+from . import tools
+
+# changes whenever the layout of the cache entries changes
+cacheFormat = 1
+
+
+def _fileHash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+class ConfigCache(object):
+    """On-disk cache of parsed configuration files.
+
+       An entry holds the parsed config and all files it links with
+       %linkFile (transitively) in marshal format, together with the content
+       hashes of these inputs. Loading a config from a valid entry skips
+       parsing and puts the linked files into the json cache used by
+       ResolveLinks. An entry is invalid as soon as one of its inputs
+       changed, it is rebuilt on the next load.
+
+       Only %linkFile entries whose path is known before any tool runs are
+       found, i.e. absolute paths, paths relative to the working directory
+       and paths using values of the top level config like
+       ${/EXRUN_CONF_DIR}. Other links are resolved as usual."""
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def entryPath(self, path, contentHash):
+        key = hashlib.sha1()
+        key.update(("%d %s %s\n" % (
+            cacheFormat, sys.version, path)).encode("utf-8"))
+        key.update(contentHash)
+        return os.path.join(self.directory, key.hexdigest() + ".excache")
+
+    def load(self, jsonPath):
+        path = os.path.abspath(jsonPath)
+        with open(path, 'rb') as jsonFile:
+            content = jsonFile.read()
+        entryPath = self.entryPath(path, hashlib.sha1(content).digest())
+
+        entry = self.readEntry(entryPath)
+        if entry is not None and self.isValid(entry):
+            logging.debug("Loaded %s from config cache." % (path))
+            for linkPath, _, _, data in entry["links"]:
+                framework.cacheJson(
+                    linkPath, framework.fileVersion(linkPath), data)
+            return marshal.loads(entry["config"])
+
+        config = framework.parseCommentedJson(content, path)
+        self.writeEntry(entryPath, path, config)
+        return config
+
+    def readEntry(self, entryPath):
+        try:
+            with open(entryPath, 'rb') as entryFile:
+                entry = marshal.load(entryFile)
+        except FileNotFoundError:
+            return None
+        except (EOFError, ValueError, TypeError) as e:
+            logging.warning("Ignoring broken cache entry %s: %s"
+                            % (entryPath, e))
+            return None
+
+        if not isinstance(entry, dict) or entry.get("format") != cacheFormat:
+            return None
+        return entry
+
+    def isValid(self, entry):
+        for linkPath, version, contentHash, _ in entry["links"]:
+            try:
+                if framework.fileVersion(linkPath) != version \
+                        and _fileHash(linkPath) != contentHash:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def findLinkedFiles(self, path, config):
+        """Returns the absolute paths of all files linked from config and
+           from the linked files."""
+        context = tools.Tool()
+        context.setup(framework.Metadata(dict(config)))
+        context.config[json_names.exrunConfDir.text] = os.path.dirname(path)
+
+        found = list()
+        toScan = [config]
+        while len(toScan) > 0:
+            for linkFile in framework.findLinkFiles(toScan.pop()):
+                try:
+                    linkFile = os.path.abspath(context.substitute(linkFile))
+                except Exception:
+                    # depends on values that are only known later
+                    continue
+                if linkFile not in found and os.path.isfile(linkFile):
+                    found.append(linkFile)
+                    toScan.append(framework.loadJsonCached(linkFile))
+        return found
+
+    def writeEntry(self, entryPath, path, config):
+        links = list()
+        for linkPath in self.findLinkedFiles(path, config):
+            version = framework.fileVersion(linkPath)
+            data = marshal.dumps(framework.loadJsonCached(linkPath))
+            links.append((linkPath, version, _fileHash(linkPath), data))
+
+        entry = {
+            "format": cacheFormat,
+            "config": marshal.dumps(config),
+            "links": links,
+        }
+
+        # write to a temporary file first, so concurrent readers never see
+        # a partial entry
+        handle, tmpPath = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as entryFile:
+                marshal.dump(entry, entryFile)
+            os.replace(tmpPath, entryPath)
+        except BaseException:
+            os.unlink(tmpPath)
+            raise
+        logging.debug("Stored %s with %d linked files in config cache."
+                      % (path, len(links)))
@@ -2,6 +2,7 @@ CREATE TABLE `exprun.worklist` (
   `id` INT NOT NULL AUTO_INCREMENT,
   `workgroup` VARCHAR(45) NULL,
   `config_file` VARCHAR(255) NULL,
+  `config_index` INT NULL,
   `hash` BINARY(20) NULL,
   `aquired` TIMESTAMP NULL,
   `state` ENUM('open', 'processing', 'done', 'error') NOT NULL DEFAULT 'open',
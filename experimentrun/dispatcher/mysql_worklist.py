@@ -11,6 +11,7 @@ from contextlib import closing
 from experimentrun import framework
 from experimentrun.tools import BlockedExceptionDuringRun
 from experimentrun import json_names
+from experimentrun import config_cache
 from copy import copy
 
 
@@ -48,6 +49,11 @@ def main():
     parser.add_argument(
         "-c", "--cleanBatch", action="store_true", default=False,
         help="Clean all entries from the configured batch.")
+    parser.add_argument(
+        "-a", "--addTemplate", action="append", default=list(),
+        help="Add one entry per exploded configuration of the given json "
+             "file to the configured batch. Entries store the file and the "
+             "configuration index instead of a json file per configuration.")
     parser.add_argument(
         '-d', '--debug',
         help="Print lots of debugging statements",
@@ -59,6 +65,12 @@ def main():
         help="Be verbose",
         action="store_const", dest="loglevel", const=logging.INFO,
     )
+    parser.add_argument(
+        '--cacheDir',
+        help="Keep parsed configurations and linked files in this directory "
+             "to speed up later runs.",
+        default=None
+    )
     parser.add_argument(
         '-I', '--include',
         action="append",
@@ -88,7 +100,16 @@ def main():
             service.cleanItems()
             exit()
 
-    dispatcher = MysqlWorklistDispatcher(config)
+    if len(args.addTemplate) > 0:
+        with DBService.fromConfig(config, args.batchmode) as service:
+            for template in args.addTemplate:
+                template = os.path.abspath(template)
+                plan = framework.ExplosionPlan(framework.loadJson(template))
+                service.addTemplateItems(template, plan)
+                print("Added %i configurations of %s." % (plan.count, template))
+            exit()
+
+    dispatcher = MysqlWorklistDispatcher(config, args.cacheDir)
     dispatcher.run(batchmode = args.batchmode)
 
     # service.addItem("abisko", "/home/asdf.json")
@@ -103,13 +124,13 @@ def cleanItemsQuery(prefix):
 
 def addQuery(prefix):
     return  """
-            INSERT into `{}worklist` (workgroup, config_file)
-            values (%(workgroup)s, %(config_file)s);
+            INSERT into `{}worklist` (workgroup, config_file, config_index, hash)
+            values (%(workgroup)s, %(config_file)s, %(config_index)s, %(hash)s);
         """.format((prefix))
 
 def selectQuery(prefix):
     return  """
-            SELECT id, config_file
+            SELECT id, config_file, config_index
             from `{}worklist`
             where workgroup = %(workgroup)s
                 and state = 'open'
@@ -250,11 +271,26 @@ class DBService:
             return result
 
     @retry
-    def addItem(self, config_file):
+    def addItem(self, config_file, config_index = None, hash = None):
         with self.connection.cursor() as cursor:
             cursor.execute(
                 addQuery(self.prefix),
-                {'workgroup': self.workgroup, 'config_file': config_file})
+                {'workgroup': self.workgroup, 'config_file': config_file,
+                 'config_index': config_index, 'hash': hash})
+            self.connection.commit()
+
+    @retry
+    def addTemplateItems(self, config_file, plan):
+        """Adds one item per exploded configuration of the template
+        config_file, the item stores the index and the hash (see
+        framework.configHash) of the configuration."""
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                addQuery(self.prefix),
+                [{'workgroup': self.workgroup, 'config_file': config_file,
+                  'config_index': index,
+                  'hash': framework.configHash(plan[index])}
+                 for index in range(plan.count)])
             self.connection.commit()
 
     @retry
@@ -266,8 +302,32 @@ class DBService:
             self.connection.commit()
 
 class MysqlWorklistDispatcher:
-    def __init__(self, dbconfig):
+    def __init__(self, dbconfig, cacheDir = None):
         self.dbconfig = dbconfig
+        self.planPath = None
+        self.plan = None
+        self.cache = None
+        if cacheDir is not None:
+            self.cache = config_cache.ConfigCache(cacheDir)
+
+    def loadJson(self, path):
+        if self.cache is None:
+            return framework.loadJson(path)
+        return self.cache.load(path)
+
+    def loadConfig(self, item):
+        """Loads the config of a work item. Items with a config_index refer
+        to an exploded configuration of the template in config_file, the
+        compiled template is kept for consecutive items of the same file."""
+        path = item["config_file"]
+        index = item.get("config_index")
+        if index is None:
+            return self.loadJson(path)
+
+        if self.planPath != path:
+            self.plan = framework.ExplosionPlan(self.loadJson(path))
+            self.planPath = path
+        return self.plan[index]
 
     def run(self, batchmode = True):
         print("Running on: " + socket.gethostname())
@@ -286,11 +346,14 @@ class MysqlWorklistDispatcher:
             framework.includes.append(dirname)
             sys.path.append(dirname)
 
-            print("Working on: %s" % (path))
+            if item.get("config_index") is None:
+                print("Working on: %s" % (path))
+            else:
+                print("Working on: %s [%i]" % (path, item["config_index"]))
 
             error = False
             try:
-                config = framework.loadJson(path)
+                config = self.loadConfig(item)
                 config[json_names.exrunConfDir.text] = str(dirname)
                 framework.bootstrap(config, path)
             except BlockedExceptionDuringRun as e:
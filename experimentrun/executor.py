@@ -0,0 +1,198 @@
+import os
+import asyncio
+import logging
+
+from collections import deque
+
+from . import framework
+from . import json_names
+from . import topology
+
+
+class _Pipeline(object):
+    """The tools of one configuration run by the ShellExecutor."""
+    def __init__(self, key, slot, metadata, cwd):
+        self.key = key
+        self.slot = slot
+        self.metadata = metadata
+        self.cwd = cwd
+        self.tool = None
+        self.fd = None
+        # the tool lists to resume after the command
+        self.pending = None
+
+
+class ShellExecutor(object):
+    """Runs the tools of many configurations in this process. When a tool
+       (RunShell) starts a command it suspends the configuration, the
+       command is supervised by an asyncio event loop and the remaining
+       tools run when it finished. So many commands run concurrently
+       without a python process for each.
+
+       Every running configuration occupies one of slots. With pin each
+       slot is a cpu (or topology.Cpu) its commands are bound to,
+       otherwise slots are only counted. The tools themselves run one at
+       a time in the thread of the event loop, they should not block for
+       long."""
+    # fallback to polling if pidfd_open is not available
+    pollInterval = 0.01
+
+    def __init__(self, slots, pin=False):
+        self.slots = list(slots)
+        self.pin = pin
+
+    def run(self, jobs, onResult):
+        """Runs jobs, an iterable of (key, config, cwd, configPath), and
+           calls onResult(key, config) for each finished configuration.
+           An exception of a configuration stops all running commands and
+           is raised."""
+        asyncio.run(self.main(jobs, onResult))
+
+    async def main(self, jobs, onResult):
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        self.jobs = iter(jobs)
+        self.onResult = onResult
+        self.freeSlots = deque(self.slots)
+        self.running = set()
+        self.exhausted = False
+
+        self.fill()
+        try:
+            await self.done
+        finally:
+            self.killAll()
+
+    def fill(self):
+        """Starts configurations while there are free slots."""
+        while len(self.freeSlots) > 0 and not self.exhausted \
+                and not self.done.done():
+            try:
+                key, config, cwd, configPath = next(self.jobs)
+            except StopIteration:
+                self.exhausted = True
+            except BaseException as e:
+                self.fail(e)
+                return
+            else:
+                self.start(key, config, cwd, configPath)
+
+        if self.exhausted and len(self.running) == 0 \
+                and not self.done.done():
+            self.done.set_result(None)
+
+    def start(self, key, config, cwd, configPath):
+        config[json_names.exrunConfDir.text] = configPath
+        metadata = framework.Metadata(config)
+        metadata.shellExecutor = self
+        slot = self.freeSlots.popleft()
+        if self.pin and isinstance(slot, topology.Cpu):
+            metadata.shellCpus = {slot.cpu}
+            metadata.shellNode = slot.node
+            config[json_names.exrunPlacement.text] = slot._asdict()
+        elif self.pin:
+            metadata.shellCpus = {slot}
+
+        pipeline = _Pipeline(key, slot, metadata, cwd)
+        self.running.add(pipeline)
+        self.advance(pipeline, metadata.runAllTools)
+
+    def advance(self, pipeline, step):
+        """Runs the tools of pipeline until it is suspended or finished."""
+        os.chdir(pipeline.cwd)
+        try:
+            framework.runWithExceptionHandlers(pipeline.metadata, step)
+        except framework.SuspendPipeline as suspend:
+            # tools may change the working directory
+            pipeline.cwd = os.getcwd()
+            pipeline.pending = suspend.pending
+            self.watch(pipeline, suspend.tool)
+            return
+        except BaseException as e:
+            self.running.discard(pipeline)
+            self.fail(e)
+            return
+
+        self.running.discard(pipeline)
+        self.freeSlots.append(pipeline.slot)
+        try:
+            self.onResult(pipeline.key, pipeline.metadata.config)
+        except BaseException as e:
+            self.fail(e)
+            return
+        # not called directly, configurations finishing without commands
+        # would nest fill, start and advance
+        self.loop.call_soon(self.fill)
+
+    def watch(self, pipeline, tool):
+        """Waits for the process of tool without blocking the loop."""
+        process = tool.process
+        pipeline.tool = tool
+        timer = None
+        if tool.timeout is not None:
+            timer = self.loop.call_later(tool.timeout, self.kill, tool)
+
+        if hasattr(os, "pidfd_open"):
+            fd = os.pidfd_open(process.pid)
+            pipeline.fd = fd
+            self.loop.add_reader(fd, self.reap, pipeline, tool, timer, fd)
+        else:
+            self.loop.call_later(
+                self.pollInterval, self.reap, pipeline, tool, timer, None)
+
+    def reap(self, pipeline, tool, timer, fd):
+        process = tool.process
+        pid, status, info = os.wait4(process.pid, os.WNOHANG)
+        if pid == 0:
+            if fd is None:
+                self.loop.call_later(
+                    self.pollInterval, self.reap, pipeline, tool, timer, fd)
+            return
+
+        if fd is not None:
+            self.loop.remove_reader(fd)
+            os.close(fd)
+            pipeline.fd = None
+        if timer is not None:
+            timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+        # the output capture waits for children of the command still
+        # holding its pipes, which must not block the loop
+        stopped = self.loop.run_in_executor(None, tool.stopMonitoring)
+        stopped.add_done_callback(
+            lambda stopped: self.finish(pipeline, tool, info, stopped))
+
+    def finish(self, pipeline, tool, info, stopped):
+        """Resumes pipeline after the monitoring of its finished command
+           stopped."""
+        if self.done.done():
+            return
+        pipeline.tool = None
+
+        def finishTool():
+            stopped.result()
+            tool.finish(info)
+        self.advance(pipeline, lambda: pipeline.metadata.resume(
+            finishTool, pipeline.pending))
+
+    def kill(self, tool):
+        if tool.process.returncode is None:
+            tool.kill()
+
+    def fail(self, exception):
+        if not self.done.done():
+            self.done.set_exception(exception)
+
+    def killAll(self):
+        """Kills and reaps the commands still running, p.a. after a
+           failure."""
+        for pipeline in self.running:
+            if pipeline.fd is not None:
+                self.loop.remove_reader(pipeline.fd)
+                os.close(pipeline.fd)
+            if pipeline.tool is not None:
+                logging.warning("Killing command of configuration %s."
+                                % (str(pipeline.key)))
+                pipeline.tool.abort()
+        self.running = set()
@@ -2,21 +2,36 @@ import re
 import sys
 import ast
 import json
+import hashlib
 import logging
 import inspect
+import functools
+import marshal
+import mmap
+import threading
 import os
-from enum import Enum
 from pydoc import locate
 from copy import deepcopy
 from copy import copy
+from bisect import bisect_right
+from collections import namedtuple
+from collections import OrderedDict
 
 from . import tools
 from . import json_names
 
+try:
+    import orjson as _fastJson
+except ImportError:
+    _fastJson = None
+
 includes = list()
 
 
-def exrun(file, toIncludes = []):
+def exrun(file, toIncludes = [], shard = None, journal = None,
+          resume = False, loadConfig = None):
+    """loadConfig parses the config file, by default loadJson, p.a.
+       config_cache.ConfigCache.load."""
     global includes
     configDir = os.path.abspath(os.path.dirname(file))
     includes.append(configDir)
@@ -24,11 +39,39 @@ def exrun(file, toIncludes = []):
         includes.append(os.path.abspath(include))
 
     sys.path.extend(includes)
-    config = loadJson(file)
+    if loadConfig is None:
+        loadConfig = loadJson
+    config = loadConfig(file)
+    if shard is not None:
+        config[json_names.exrunShard.text] = shard
+    if journal is not None:
+        config[json_names.exrunJournal.text] = os.path.abspath(journal)
+    if resume:
+        config[json_names.exrunResume.text] = True
 
     bootstrap(config, str(configDir))
 
 
+def parseShard(shard):
+    """Parses a shard given as "k/n" or [k, n], where 1 <= k <= n.
+       Returns the tuple (k, n)."""
+    if isinstance(shard, str):
+        parts = shard.split("/")
+        if len(parts) != 2:
+            raise ValueError("Expected shard as k/n, got '%s'." % (shard))
+        shard = parts
+
+    try:
+        k, n = (int(part) for part in shard)
+    except (TypeError, ValueError):
+        raise ValueError("Expected shard as k/n, got '%s'." % (shard,))
+
+    if not 1 <= k <= n:
+        raise ValueError(
+            "Shard k/n requires 1 <= k <= n, got %d/%d." % (k, n))
+    return (k, n)
+
+
 def removeComments(text):
     """Remove lines starting with //"""
     return re.sub(r"(^|\n)(\s*)//[^\n]*", "\g<1>\g<2>", text)
@@ -38,88 +81,312 @@ def removeTrailingComma(text):
     return re.sub(r",(\s*\n\s*)([\]}])", "\g<1>\g<2>", text)
 
 
+# group 1 is the text up to the next // comment or comma followed by ]
+# or }, which is removed. Strings are matched as a whole, so a " or // is
+# only seen outside of strings and comments. Each match keeps a long run
+# of text, the number of matches is that of the removed tokens.
+_commentedJsonToken = re.compile(
+    rb'([^"/,]*(?:(?:"[^"\\]*(?:\\.[^"\\]*)*"?|/(?!/)'
+    rb'|,(?!(?:\s|//[^\n]*\n)*[\]}]))[^"/,]*)*)'
+    rb'(?://[^\n]*|,)?', re.DOTALL)
+
+
+def _stripCommentsAndTrailingCommas(data):
+    """Removes // comments up to the end of the line and trailing commas
+       in a single pass, strings are kept as they are."""
+    return _commentedJsonToken.sub(rb"\g<1>", data)
+
+
+# files of at least this size are read through mmap
+mmapThreshold = 1024 * 1024
+
+
+def _loads(data):
+    if isinstance(data, bytes):
+        return (_fastJson or json).loads(data)
+    elif _fastJson is not None:
+        with memoryview(data) as view:
+            return _fastJson.loads(view)
+    else:
+        return json.loads(bytes(data))
+
+
+def parseCommentedJson(data, jsonPath="<json>"):
+    """Parses json (bytes or mmap) which may contain // comments and
+       trailing commas."""
+    try:
+        return _loads(data)
+    except ValueError:
+        # not plain json, remove comments and trailing commas
+        pass
+
+    text = _stripCommentsAndTrailingCommas(data)
+    try:
+        return _loads(text)
+    except ValueError:
+        pass
+
+    # the standard parser accepts some input the fast parser does not
+    # (p.a. NaN and big integers) and gives the error position
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        sys.exit("Error in json file %s:%d:%d: %s"
+                 % (jsonPath, e.lineno, e.colno, e.msg))
+
+
 def loadJson(jsonPath):
-    with open(jsonPath, 'r') as jsonFile:
-        text = removeComments(jsonFile.read())
-        text = removeTrailingComma(text)
-        try:
-            config = json.loads(text)
-        except json.JSONDecodeError as e:
-            sys.exit("Error in json file %s:%d:%d: %s"
-                     % (jsonPath, e.lineno, e.colno, e.msg))
+    with open(jsonPath, 'rb') as jsonFile:
+        size = os.fstat(jsonFile.fileno()).st_size
+        if size < mmapThreshold:
+            return parseCommentedJson(jsonFile.read(), jsonPath)
+
+        with mmap.mmap(jsonFile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parseCommentedJson(data, jsonPath)
+
+
+_jsonCache = OrderedDict()
+_jsonCacheLock = threading.Lock()
+_jsonCacheBytes = 0
+# maximal size of the marshalled data in the cache
+jsonCacheLimit = 512 * 1024 * 1024
+
+
+def cacheJson(path, version, data):
+    """Adds the marshalled json data of the file path in the given version
+       (mtime_ns, size) to the cache of loadJsonCached."""
+    global _jsonCacheBytes
+    with _jsonCacheLock:
+        entry = _jsonCache.pop(path, None)
+        if entry is not None:
+            _jsonCacheBytes -= len(entry[1])
+        if len(data) <= jsonCacheLimit:
+            _jsonCache[path] = (version, data)
+            _jsonCacheBytes += len(data)
+            while _jsonCacheBytes > jsonCacheLimit:
+                _, (_, evicted) = _jsonCache.popitem(last=False)
+                _jsonCacheBytes -= len(evicted)
+
+
+def fileVersion(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def loadJsonCached(jsonPath):
+    """Like loadJson, but parsed files are kept in a process wide cache
+       keyed by path, modification time and size. Each call returns an
+       independent copy, which is created from the marshalled data and is
+       much cheaper than parsing. The least recently used files are dropped
+       when the cache exceeds jsonCacheLimit. Processes forked from this one
+       (p.a. pool workers) inherit the cache."""
+    path = os.path.abspath(jsonPath)
+    version = fileVersion(path)
+
+    with _jsonCacheLock:
+        entry = _jsonCache.get(path, None)
+        if entry is not None and entry[0] == version:
+            _jsonCache.move_to_end(path)
+            return marshal.loads(entry[1])
+
+    config = loadJson(path)
+    cacheJson(path, version, marshal.dumps(config))
     return config
 
 
-class Metadata(object):
-    def __init__(self, config=dict(), imports="experimentrun.tools"):
-        self.config = config
-        self.registration = list()
-        self.exceptionHandler = list()
-        self.context = tools.Tool()
-        self.context.setup(self)
+def findLinkFiles(config, linkFileString=json_names.linkFile.text):
+    """Yields the (not substituted) file names of all %linkFile entries."""
+    if isinstance(config, dict):
+        if linkFileString in config:
+            yield config[linkFileString]
+        else:
+            for value in config.values():
+                yield from findLinkFiles(value, linkFileString)
+    elif isinstance(config, list):
+        for value in config:
+            yield from findLinkFiles(value, linkFileString)
 
-    def loadAndRunTool(self, className, parameter):
+
+class SuspendPipeline(Exception):
+    """Raised by a tool to pause the tools of a configuration without
+       running the exception handlers, p.a. while its command runs in a
+       ShellExecutor. The remaining tools run on Metadata.resume.
+       pending holds the tool lists that were running, innermost first."""
+    def __init__(self, tool):
+        super().__init__()
+        self.tool = tool
+        self.pending = list()
+
+
+def _handleExceptionOnRun(metadata, e):
+    handled = False
+    for handler in metadata.exceptionHandler:
+        handled |= handler.handleExceptionOnRun(e)
+        if handled:
+            break
+
+    if not handled:
+        raise
+
+
+def _isMutable(value):
+    if isinstance(value, (list, dict, set)):
+        return True
+    elif isinstance(value, tuple):
+        return any(_isMutable(entry) for entry in value)
+    return False
+
+
+_locatedClasses = dict()
+
+
+def _locate(className):
+    """pydoc.locate with a cache for successfully located names."""
+    klass = _locatedClasses.get(className, None)
+    if klass is None:
         klass = locate(className)
-        instance = None
+        if klass is not None:
+            _locatedClasses[className] = klass
+    return klass
+
+
+class CompiledTool(object):
+    """A tool constructor whose class name and parameters are parsed once.
+       The class is located on the first run and reused afterwards, so the
+       same object can be run cheaply for many configurations."""
+    def __init__(self, className, parameter):
+        if not (parameter is None or isinstance(parameter, (tuple, dict))):
+            raise TypeError(
+                "For parameter 'parameter': Expected %s or %s but got %s" %
+                (tuple.__name__, dict.__name__, parameter.__class__.__name__))
+
+        self.className = className
+        self.parameter = parameter
+        # parameters are shared between runs, tools get their own copy if
+        # they could modify them
+        self.copyParameter = _isMutable(parameter)
+        self.klass = None
+
+    def resolve(self):
+        klass = _locate(self.className)
         if (klass is None):
             logging.debug("sys.path = " + str(sys.path))
             sys.exit("Failed to load %s."
-                     % (className))
+                     % (self.className))
 
         if not inspect.isclass(klass):
-            if callable(klass):
-                try:
-                    if parameter is None:
-                        klass(self.context)
-                    elif isinstance(parameter, tuple):
-                        klass(self.context,*parameter)
-                    elif isinstance(parameter, dict):
-                        klass(self.context,**parameter)
-                    else:
-                        raise TypeError(
-                            "For parameter 'parameter': Expected %s or %s but got %s" %
-                            (tuple.__name__, dict.__name__, parameter.__class__.__name__))
-                except Exception as e:
-                    handled = False
-                    for handler in self.exceptionHandler:
-                        handled |= handler.handleExceptionOnRun(e)
-                        if handled:
-                            break
-
-                    if not handled:
-                        raise
-            else:
+            if not callable(klass):
                 sys.exit("Failed to load %s: Neither a class nor callable."
                          % (klass.__name__))
+        elif not issubclass(klass, tools.Tool):
+            sys.exit("Failed to load class %s: Not inherited from "
+                     "compbench.tools.Tool."
+                     % (klass.__name__))
+
+        self.isClass = inspect.isclass(klass)
+        self.klass = klass
+
+    def locate(self):
+        """Returns the class or function of the tool, None if it can not be
+           located. Unlike resolve this does not exit on failure."""
+        if self.klass is not None:
+            return self.klass
+        return _locate(self.className)
+
+    def instantiate(self):
+        """Returns a new instance of the tool class."""
+        if self.klass is None:
+            self.resolve()
+
+        parameter = self.parameter
+        if self.copyParameter:
+            parameter = deepcopy(parameter)
+
+        if parameter is None:
+            return self.klass()
+        elif isinstance(parameter, tuple):
+            return self.klass(*parameter)
         else:
-            if not issubclass(klass, tools.Tool):
-                sys.exit("Failed to load class %s: Not inherited from "
-                         "compbench.tools.Tool."
-                         % (klass.__name__))
+            return self.klass(**parameter)
 
-            if parameter is None:
-                instance = klass()
-            elif isinstance(parameter, tuple):
-                instance = klass(*parameter)
-            elif isinstance(parameter, dict):
-                instance = klass(**parameter)
-            else:
-                raise TypeError(
-                    "For parameter 'parameter': Expected %s or %s but got %s" %
-                    (tuple.__name__, dict.__name__, parameter.__class__.__name__))
+    def run(self, metadata):
+        if self.klass is None:
+            self.resolve()
 
+        if not self.isClass:
+            parameter = self.parameter
+            if self.copyParameter:
+                parameter = deepcopy(parameter)
+
+            try:
+                if parameter is None:
+                    self.klass(metadata.context)
+                elif isinstance(parameter, tuple):
+                    self.klass(metadata.context, *parameter)
+                else:
+                    self.klass(metadata.context, **parameter)
+            except SuspendPipeline:
+                raise
+            except Exception as e:
+                _handleExceptionOnRun(metadata, e)
+        else:
+            instance = self.instantiate()
             try:
-                instance.setup(self)
+                instance.setup(metadata)
                 instance.run()
+            except SuspendPipeline:
+                raise
             except Exception as e:
-                handled = False
-                for handler in self.exceptionHandler:
-                    handled |= handler.handleExceptionOnRun(e)
-                    if handled:
-                        break
+                _handleExceptionOnRun(metadata, e)
 
-                if not handled:
-                    raise
+
+def _parseParameter(parameterString):
+    try:
+        return ast.literal_eval(parameterString)
+    except ValueError as e:
+        logging.error("Malformed parameter string, the following should be valid python code: %s"%parameterString )
+        raise e
+
+
+@functools.lru_cache(maxsize=4096)
+def compileToolString(classString):
+    """Parses a tool string like "module.Tool(1, 'a')" or
+       "module.Tool{'name': 1}" into a CompiledTool. Results are cached by
+       the string, so the tools of exploded configurations are parsed only
+       once."""
+    match = re.match(r"([^\(\{]*)(([\{\(])(.*)[\)\}])?\s*$", classString)
+
+    if (match):
+        className = match.group(1)
+        parameterType = match.group(3)
+        parameterString = match.group(4)
+
+        parameter = None
+        if parameterType == '(':
+            if parameterString and not parameterString.isspace():
+                parameter = _parseParameter('({},)'.format(parameterString))
+        elif parameterType == '{':
+            parameter = _parseParameter('{%s}' % (parameterString))
+
+        return CompiledTool(className, parameter)
+    else:
+        sys.exit("Failed parse class (value: %s)." % (classString))
+
+
+class Metadata(object):
+    def __init__(self, config=dict(), imports="experimentrun.tools"):
+        self.config = config
+        self.registration = list()
+        self.exceptionHandler = list()
+        # set while the pipeline is run by an executor.ShellExecutor
+        self.shellExecutor = None
+        self.shellCpus = None
+        self.shellNode = None
+        self.context = tools.Tool()
+        self.context.setup(self)
+
+    def loadAndRunTool(self, className, parameter):
+        CompiledTool(className, parameter).run(self)
 
     def loadAndRunToolFromDict(self, constructor):
         self.loadAndRunTool(
@@ -127,34 +394,7 @@ class Metadata(object):
             constructor["parameters"])
 
     def loadAndRunToolFromString(self, classString):
-        match = re.match(r"([^\(\{]*)(([\{\(])(.*)[\)\}])?\s*$", classString)
-
-        if (match):
-            className = match.group(1)
-            parameterType = match.group(3)
-            parameterString = match.group(4)
-
-            if parameterType == '(':
-                if not parameterString or parameterString.isspace():
-                    parameter = None
-                else:
-                    parameterString = '({},)'.format(parameterString)
-                    try:
-                        parameter = ast.literal_eval(parameterString)
-                    except ValueError as e:
-                        logging.error("Malformed parameter string, the following should be valid python code: %s"%parameterString )
-                        raise e
-            elif parameterType == '{':
-                parameterString = '{%s}' % (parameterString)
-                try:
-                    parameter = ast.literal_eval(parameterString)
-                except ValueError as e:
-                    logging.error("Malformed parameter string, the following should be valid python code: %s"%parameterString )
-
-
-            self.loadAndRunTool(className, parameter)
-        else:
-            sys.exit("Failed parse class (value: %s)." % (classString))
+        compileToolString(classString).run(self)
 
     def run(self, constructor):
         if isinstance(constructor, list):
@@ -168,21 +408,60 @@ class Metadata(object):
 
 
     def runConstructorList(self, constructorList):
+        """Runs and consumes the tools in constructorList. Each tool is
+           removed before it runs, so the list always holds the remaining
+           tools, tools may append further tools to it."""
         while (len(constructorList) > 0):
             constructor = constructorList.pop(0)
 
-            self.run(constructor)
+            try:
+                self.run(constructor)
+            except SuspendPipeline as suspend:
+                # a nested list is resumed with its remaining tools
+                if isinstance(constructor, list) and len(constructor) > 0:
+                    constructorList.insert(0, constructor)
+                if len(suspend.pending) > 0 \
+                        and suspend.pending[-1] is constructor:
+                    # the nested list is part of this one
+                    suspend.pending[-1] = constructorList
+                else:
+                    suspend.pending.append(constructorList)
+                raise
 
     def runAllTools(self):
         self.runConstructorList(self.config.get("tools", list()))
 
+    def resume(self, function, pending=None):
+        """Continues a suspended pipeline. function finishes the tool that
+           suspended it and is treated like running that tool, afterwards
+           the remaining tools of the lists pending of the SuspendPipeline
+           are run, by default those of config["tools"]."""
+        try:
+            function()
+        except SuspendPipeline as suspend:
+            suspend.pending.extend(pending or list())
+            raise
+        except Exception as e:
+            _handleExceptionOnRun(self, e)
+        if pending is None:
+            pending = [self.config.get("tools", list())]
+        while len(pending) > 0:
+            try:
+                self.runConstructorList(pending[0])
+            except SuspendPipeline as suspend:
+                # the outer lists continue after the suspended one
+                suspend.pending.extend(pending[1:])
+                raise
+            pending.pop(0)
 
-def bootstrap(config, configPath):
-    config[json_names.exrunConfDir.text] = configPath
 
-    metadata = Metadata(config)
+def runWithExceptionHandlers(metadata, function):
+    """Calls function, p.a. metadata.runAllTools, and passes exceptions to
+       the handleExceptionOnRunAll of the registered exception handlers."""
     try:
-        metadata.runAllTools()
+        function()
+    except SuspendPipeline:
+        raise
     except Exception as e:
         handled = False
         for handler in metadata.exceptionHandler:
@@ -192,70 +471,169 @@ def bootstrap(config, configPath):
 
         if not handled:
             raise
+
+
+def bootstrap(config, configPath):
+    config[json_names.exrunConfDir.text] = configPath
+
+    metadata = Metadata(config)
+    runWithExceptionHandlers(metadata, metadata.runAllTools)
     return metadata.config
 
 
-class ExploadState(Enum):
-    normal = 1
-    exploaded = 2
+class _Constant(object):
+    """Part of a configuration that contains no %explode entry."""
+    def __init__(self, value):
+        self.value = value
+        self.count = 1
+
+    def variants(self):
+        yield self.value
 
+    def variant(self, index):
+        return self.value
 
-def _createExploadedCopies(exploadedSubEntries, config):
-    result = list()
-    result.append(config)
-    for key, valueList in exploadedSubEntries:
-        exploadedResult = list()
-        for value in valueList:
-            for config in result:
-                cop = copy(config)
-                cop[key] = value
-                exploadedResult.append(cop)
-        result = exploadedResult
+    def collectSites(self, path, sites):
+        pass
 
-    return result
 
+class _Alternatives(object):
+    """An %explode entry, every option may be exploded itself."""
+    def __init__(self, options):
+        self.options = options
+        self.offsets = list()
+        self.count = 0
+        for option in options:
+            self.offsets.append(self.count)
+            self.count += option.count
 
-def _explodeConfig(config, explodeString):
-    exploadedSubEntries = list()
+    def variants(self):
+        for option in self.options:
+            yield from option.variants()
+
+    def variant(self, index):
+        optionIdx = bisect_right(self.offsets, index) - 1
+        return self.options[optionIdx].variant(index - self.offsets[optionIdx])
+
+    def collectSites(self, path, sites):
+        sites.append(ExplosionSite(path, len(self.options)))
+        for option in self.options:
+            option.collectSites(path, sites)
+
+
+class _Product(object):
+    """A dict or list with exploded entries (sites). The variants are the
+       cartesian product of the variants of all sites, where the first
+       site changes fastest."""
+    def __init__(self, container, sites):
+        self.container = container
+        self.sites = sites
+        self.count = 1
+        for key, node in sites:
+            self.count *= node.count
+
+    def variants(self):
+        return self._variants(len(self.sites))
+
+    def _variants(self, numSites):
+        if numSites == 0:
+            yield self.container
+        else:
+            key, node = self.sites[numSites - 1]
+            for value in node.variants():
+                for partial in self._variants(numSites - 1):
+                    cop = copy(partial)
+                    cop[key] = value
+                    yield cop
+
+    def variant(self, index):
+        cop = copy(self.container)
+        for key, node in self.sites:
+            index, subIndex = divmod(index, node.count)
+            cop[key] = node.variant(subIndex)
+        return cop
+
+    def collectSites(self, path, sites):
+        for key, node in self.sites:
+            part = str(key).replace("~", "~0").replace("/", "~1")
+            node.collectSites(path + "/" + part, sites)
+
+
+def _compileExplosion(config, explodeString):
+    sites = list()
 
     if isinstance(config, dict):
-        for key, value in config.items():
-            if key == explodeString:
-                if type(value) is not list:
-                    sys.exit(
-                        "Tried to expload value but no list was provided."
-                        "Got '%s' instead" % value)
-                else:
-                    variants = list()
-                    for entry in value:
-                        state, subConfig = _explodeConfig(entry, explodeString)
-                        if (state == ExploadState.exploaded):
-                            variants.extend(subConfig)
-                        else:
-                            variants.append(subConfig)
-                    return (ExploadState.exploaded, variants)
+        if explodeString in config:
+            value = config[explodeString]
+            if type(value) is not list:
+                sys.exit(
+                    "Tried to expload value but no list was provided."
+                    "Got '%s' instead" % value)
+            return _Alternatives(
+                [_compileExplosion(entry, explodeString) for entry in value])
 
-            else:
-                state, subConfig = _explodeConfig(value, explodeString)
-                if (state == ExploadState.exploaded):
-                    exploadedSubEntries.append((key, subConfig))
+        for key, value in config.items():
+            node = _compileExplosion(value, explodeString)
+            if not isinstance(node, _Constant):
+                sites.append((key, node))
 
     elif isinstance(config, list):
         for idx, value in enumerate(config):
-            state, subConfig = _explodeConfig(value, explodeString)
-            if (state == ExploadState.exploaded):
-                exploadedSubEntries.append((idx, subConfig))
+            node = _compileExplosion(value, explodeString)
+            if not isinstance(node, _Constant):
+                sites.append((idx, node))
 
-    if len(exploadedSubEntries) == 0:
-        return (ExploadState.normal, config)
+    if len(sites) == 0:
+        return _Constant(config)
     else:
-        exploaded = _createExploadedCopies(exploadedSubEntries, config)
-        return (ExploadState.exploaded, exploaded)
+        return _Product(config, sites)
 
 
-def explodeConfig(config, explodeString=json_names.explode.text):
-    state, confs = _explodeConfig(config, explodeString)
-    if (state == ExploadState.normal):
-        confs = list([confs])
+ExplosionSite = namedtuple("ExplosionSite", ["path", "size"])
+
+
+class ExplosionPlan(object):
+    """Compiled form of a configuration with %explode entries.
+
+       The plan knows the number of exploded configurations without
+       creating them and gives random access to them, plan[i] returns the
+       same configuration as the i-th entry of explodeConfig(config).
+       sites lists every %explode entry as json pointer and number of
+       options, entries nested in options of another entry are included."""
+    def __init__(self, config, explodeString=json_names.explode.text):
+        self.root = _compileExplosion(config, explodeString)
+        self.count = self.root.count
+        self.sites = list()
+        self.root.collectSites("", self.sites)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("configuration index %d out of range" % (index))
+        return deepcopy(self.root.variant(index))
 
-    return [deepcopy(conf) for conf in confs]
+    def __iter__(self):
+        for conf in self.root.variants():
+            yield deepcopy(conf)
+
+
+def configHash(config):
+    """Returns the sha1 digest (20 bytes) of the canonical json form of
+       config, i.e. with sorted keys and without whitespace."""
+    text = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def iterExplodedConfigs(config, explodeString=json_names.explode.text):
+    """Yields the exploded configurations one at a time. Each yielded
+       configuration is an independent copy, the variants are only created
+       when requested."""
+    return iter(ExplosionPlan(config, explodeString))
+
+
+def explodeConfig(config, explodeString=json_names.explode.text):
+    return list(iterExplodedConfigs(config, explodeString))
@@ -0,0 +1,224 @@
+import os
+import re
+import ast
+import sys
+
+import jsonpointer
+
+from . import json_names
+from . import framework
+
+
+# the ${..} and %{..} placeholders of Tool.substitute
+_placeholder = re.compile(r"(\$|%){([^{}]*)}")
+_specialKeys = frozenset((json_names.explode.text, json_names.evaluate.text,
+                          json_names.link.text, json_names.linkFile.text))
+_plainTypes = (str, int, float, bool, type(None))
+
+
+def _isPlain(data):
+    """True if data is json data without %explode, %eval and link
+       entries, i.e. it is the same before and after preprocessing."""
+    if isinstance(data, dict):
+        return _specialKeys.isdisjoint(data) \
+            and all(_isPlain(value) for value in data.values())
+    elif isinstance(data, list):
+        return all(_isPlain(value) for value in data)
+    return isinstance(data, _plainTypes)
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _codeNames(code):
+    """Returns all names used by code, including nested code objects."""
+    names = set(code.co_names) | set(code.co_varnames)
+    for const in code.co_consts:
+        if hasattr(const, "co_names"):
+            names |= _codeNames(const)
+    return names
+
+
+def _hasCall(expression):
+    """True if the expression calls anything, the result of calls like
+       random.random() or time.time() may differ per configuration."""
+    return any(isinstance(node, ast.Call)
+               for node in ast.walk(ast.parse(expression, mode="eval")))
+
+
+class InvariantHoister(object):
+    """Evaluates the %link, %linkFile and %eval entries of a configuration
+       template once, if they do not depend on any %explode entry, instead
+       of once per exploded configuration.
+
+       Only entries the tools of the template would evaluate are hoisted,
+       i.e. entries below the basePtr of ResolveLinks and Eval tools, in
+       the order of these tools. Entries are left to the exploded
+       configurations if they are inside or contain an %explode entry, use
+       %{..}, values of exploded entries or non scalar values, relative
+       file names, or refer to self. %eval entries are only hoisted if
+       they call nothing and evaluate without error. Hoisted entries are
+       evaluated on the template, so the values they use must not be
+       changed by tools running before the preprocessing tools."""
+    def __init__(self, template, configPath):
+        self.template = template
+        template[json_names.exrunConfDir.text] = configPath
+        self.metadata = framework.Metadata(template)
+        self.context = self.metadata.context
+        self.sites = [site.path for site in
+                      framework.ExplosionPlan(template).sites]
+
+    def dependsOnExplode(self, path):
+        """True if the entry at json pointer path is inside or contains an
+           %explode entry."""
+        for site in self.sites:
+            if site == path or site.startswith(path + "/") \
+                    or path.startswith(site + "/"):
+                return True
+        return False
+
+    def substitute(self, text):
+        """Returns the substituted text or None if it depends on the
+           exploded configuration."""
+        if not isinstance(text, str):
+            return None
+        for match in _placeholder.finditer(text):
+            if match.group(1) != "$" or self.dependsOnExplode(match.group(2)):
+                return None
+            try:
+                value = self.context.access(match.group(2))
+            except Exception:
+                return None
+            # replacements that are substituted again are not followed
+            if not isinstance(value, _plainTypes) or \
+                    (isinstance(value, str) and "{" in value):
+                return None
+        try:
+            return self.context.substitute(text)
+        except Exception:
+            return None
+
+    def preprocessors(self):
+        """Yields the preprocessing tools of the template, tools with
+           hoistMarkers (ResolveLinks and Eval)."""
+        for constructor in self.template.get("tools", list()):
+            if isinstance(constructor, str):
+                compiled = framework.compileToolString(constructor)
+            elif isinstance(constructor, dict) and "name" in constructor:
+                compiled = framework.CompiledTool(
+                    constructor["name"], constructor.get("parameters", None))
+            else:
+                continue
+
+            klass = compiled.locate()
+            if isinstance(klass, type) and hasattr(klass, "hoistMarkers"):
+                yield compiled.instantiate()
+
+    def markers(self, data, key, path, markerTexts, found):
+        """Appends (container, key, path) of all entries below data[key]
+           that are dicts with one of markerTexts to found."""
+        value = data[key]
+        if isinstance(value, dict):
+            if not markerTexts.isdisjoint(value):
+                found.append((data, key, path))
+            elif json_names.explode.text not in value:
+                for childKey in value:
+                    self.markers(value, childKey, path + "/" + _escape(
+                        childKey), markerTexts, found)
+        elif isinstance(value, list):
+            for idx in range(len(value)):
+                self.markers(value, idx, path + "/" + str(idx),
+                             markerTexts, found)
+        return found
+
+    def findMarkers(self, basePtr, markerTexts):
+        pointer = jsonpointer.JsonPointer(basePtr)
+        found = list()
+        if len(pointer.parts) == 0 or pointer.parts == ['']:
+            for key in self.template:
+                self.markers(self.template, key, "/" + _escape(key),
+                             markerTexts, found)
+        else:
+            try:
+                parentPtr = jsonpointer.JsonPointer.from_parts(
+                    pointer.parts[:-1])
+                parent = self.context.access(parentPtr.path)
+            except Exception:
+                return found
+            key = pointer.parts[-1]
+            if isinstance(parent, list):
+                key = int(key)
+            self.markers(parent, key, basePtr, markerTexts, found)
+        return found
+
+    def hoistLink(self, data, key):
+        target = self.substitute(data[key][json_names.link.text])
+        if target is None or self.dependsOnExplode(target):
+            return False
+        try:
+            value = self.context.access(target)
+        except Exception:
+            # the target may be created by a tool, or the default is used
+            return False
+        if not _isPlain(value):
+            return False
+        data[key] = value
+        return True
+
+    def hoistLinkFile(self, data, key):
+        file = self.substitute(data[key][json_names.linkFile.text])
+        if file is None or not os.path.isabs(file) \
+                or not os.path.isfile(file):
+            return False
+        value = framework.loadJsonCached(file)
+        if not _isPlain(value):
+            return False
+        data[key] = value
+        return True
+
+    def hoistEval(self, data, key, tool):
+        expression = self.substitute(data[key][json_names.evaluate.text])
+        if expression is None:
+            return False
+        try:
+            code = compile(expression, "<%eval>", "eval")
+        except SyntaxError:
+            return False
+        # Eval.evaluate runs the expression with access to self and data
+        if not _codeNames(code).isdisjoint(("self", "data")) \
+                or _hasCall(expression):
+            return False
+        try:
+            # the globals Eval.evaluate runs the expression with
+            value = eval(code, vars(sys.modules[type(tool).__module__]),
+                         dict())
+        except Exception:
+            # the error is raised in each configuration, where the
+            # exception handlers of the configuration see it
+            return False
+        if value is None or not _isPlain(value):
+            return False
+        data[key] = value
+        return True
+
+    def run(self):
+        """Hoists the invariant entries, returns the number of entries."""
+        numHoisted = 0
+        for tool in self.preprocessors():
+            markerTexts = set(tool.hoistMarkers)
+
+            for data, key, path in self.findMarkers(tool.basePtr, markerTexts):
+                if self.dependsOnExplode(path):
+                    continue
+                if json_names.link.text in data[key] \
+                        and json_names.link.text in markerTexts:
+                    hoisted = self.hoistLink(data, key)
+                elif json_names.linkFile.text in data[key] \
+                        and json_names.linkFile.text in markerTexts:
+                    hoisted = self.hoistLinkFile(data, key)
+                else:
+                    hoisted = self.hoistEval(data, key, tool)
+                if hoisted:
+                    numHoisted += 1
+        return numHoisted
@@ -0,0 +1,71 @@
+import os
+import time
+import logging
+import threading
+
+
+class Journal(object):
+    """Append-only log of dispatched (D) and completed (C) jobs. Each line
+       holds the record type, the job index and the hex digest of the job
+       configuration. Records are written immediately but only forced to
+       disk (fsync) every syncEvery records or syncInterval seconds, and on
+       close. beforeSync is called before each fsync, it should make
+       everything durable the journal records rely on, p.a. the results."""
+    def __init__(self, filename, append=False, syncEvery=64,
+                 syncInterval=1.0, beforeSync=None):
+        self.filename = filename
+        self.beforeSync = beforeSync
+        self.syncEvery = syncEvery
+        self.syncInterval = syncInterval
+        self.lock = threading.Lock()
+        self.file = open(filename, 'a' if append else 'w')
+        self.unsynced = 0
+        self.lastSync = time.monotonic()
+
+    def record(self, kind, index, configHash):
+        with self.lock:
+            self.file.write("%s %d %s\n" % (kind, index, configHash.hex()))
+            self.unsynced += 1
+            if self.unsynced >= self.syncEvery \
+                    or time.monotonic() - self.lastSync >= self.syncInterval:
+                self.sync()
+
+    def dispatched(self, index, configHash):
+        self.record("D", index, configHash)
+
+    def completed(self, index, configHash):
+        self.record("C", index, configHash)
+
+    def sync(self):
+        if self.beforeSync is not None:
+            self.beforeSync()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.lastSync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self.file.close()
+
+    @staticmethod
+    def completedJobs(filename):
+        """Returns the set of (index, hash) of all completed jobs. A
+           partially written last line, p.a. after a crash, is ignored."""
+        completed = set()
+        if not os.path.exists(filename):
+            logging.warning("No journal %s to resume from." % (filename))
+            return completed
+
+        with open(filename, 'r') as journalFile:
+            for line in journalFile:
+                parts = line.split()
+                if len(parts) != 3 or parts[0] != "C" \
+                        or not line.endswith("\n"):
+                    continue
+                try:
+                    completed.add((int(parts[1]), bytes.fromhex(parts[2])))
+                except ValueError:
+                    continue
+        return completed
@@ -37,3 +37,37 @@ exrunConfDir = JsonName(
         initial configuration file.
         Usage: "YourProperty":"some text of yours ${/EXRUN_CONF_DIR}"
     """)
+
+exrunShard = JsonName(
+    r"EXRUN_SHARD",
+    r"""This is a value in the json that is set by the bootstrapping process
+        if a shard was selected on the command line (--shard k/n). It is used
+        by ExplodeNBootstrap if no shard is passed as parameter.
+        Usage: "EXRUN_SHARD":"2/4"
+    """)
+
+exrunJournal = JsonName(
+    r"EXRUN_JOURNAL",
+    r"""This is a value in the json that is set by the bootstrapping process
+        if a journal file was given on the command line (--journal). It is
+        used by ExplodeNBootstrap if no journal is passed as parameter.
+        Usage: "EXRUN_JOURNAL":"/path/to/benchmark.journal"
+    """)
+
+exrunResume = JsonName(
+    r"EXRUN_RESUME",
+    r"""This is a value in the json that is set by the bootstrapping process
+        if --resume was given on the command line. ExplodeNBootstrap then
+        skips all configurations that are recorded as completed in the
+        journal.
+        Usage: "EXRUN_RESUME":true
+    """)
+
+exrunPlacement = JsonName(
+    r"EXRUN_PLACEMENT",
+    r"""This is a value in the json that is set by ExplodeNBootstrap with
+        automatic placement (processors "auto"). It records the logical cpu,
+        its physical core, package, NUMA node and last level cache the
+        configuration ran on.
+        Usage: "EXRUN_PLACEMENT":{"cpu":2,"core":2,"package":0,"node":0,"l3":0}
+    """)
@@ -0,0 +1,188 @@
+import json
+import logging
+import sqlite3
+import os
+
+
+class ResultSink(object):
+    """Receives the result configurations of finished runs. Results are
+       buffered and written in bulk, call close when all results are
+       added."""
+    def __init__(self, bufferSize=1):
+        self.bufferSize = bufferSize
+        self.buffer = list()
+
+    def append(self, result, key=None):
+        """Adds result, key is the index of its configuration."""
+        self.buffer.append(result)
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.write(self.buffer)
+            self.buffer = list()
+
+    def write(self, results):
+        """Overwrite this method to store a list of results."""
+        pass
+
+    def sync(self):
+        """Writes buffered results and makes sure they survive a crash."""
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+class MemorySink(ResultSink):
+    """Keeps all results in memory. The list results is ordered by the
+       index of the configurations, results without index follow in the
+       order they were added."""
+    def __init__(self):
+        super().__init__()
+        self.keyed = dict()
+        self.unkeyed = list()
+
+    def append(self, result, key=None):
+        if key is None:
+            self.unkeyed.append(result)
+        else:
+            self.keyed[key] = result
+
+    @property
+    def results(self):
+        return [self.keyed[key] for key in sorted(self.keyed)] \
+            + self.unkeyed
+
+
+class JsonLinesSink(ResultSink):
+    """Appends each result as one line of json to a file."""
+    def __init__(self, filename, bufferSize=64):
+        super().__init__(bufferSize)
+        self.filename = filename
+        self.file = open(filename, 'a')
+
+    def write(self, results):
+        self.file.write(
+            "".join(json.dumps(result) + "\n" for result in results))
+        self.file.flush()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class SqliteSink(ResultSink):
+    """Stores each result as json text in a row of an SQLite table."""
+    def __init__(self, filename, table="runResults", bufferSize=64):
+        super().__init__(bufferSize)
+        self.filename = filename
+        self.table = table
+        # results may be added from callback threads of the
+        # ClusterDispatcher, which serializes the calls
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS `%s` ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "result TEXT NOT NULL)" % (self.table))
+        self.connection.commit()
+
+    def write(self, results):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO `%s` (result) VALUES (?)" % (self.table),
+                [(json.dumps(result),) for result in results])
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+class ResultCache(object):
+    """Persistent store of run results keyed by the hash of the run
+       configuration (see framework.configHash). New results are buffered
+       and written in bulk."""
+    def __init__(self, filename, bufferSize=16):
+        self.filename = filename
+        self.bufferSize = bufferSize
+        self.buffer = dict()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS resultCache ("
+            "hash BLOB PRIMARY KEY, "
+            "result TEXT NOT NULL)")
+        self.connection.commit()
+
+    def get(self, configHash):
+        """Returns the stored result or None."""
+        if configHash in self.buffer:
+            return self.buffer[configHash]
+
+        row = self.connection.execute(
+            "SELECT result FROM resultCache WHERE hash = ?",
+            (configHash,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, configHash, result):
+        self.buffer[configHash] = result
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO resultCache (hash, result) "
+                    "VALUES (?, ?)",
+                    [(key, json.dumps(result))
+                     for key, result in self.buffer.items()])
+            self.buffer = dict()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+sinkTypes = {
+    "memory": MemorySink,
+    "jsonl": JsonLinesSink,
+    "sqlite": SqliteSink,
+}
+
+
+def createSink(spec):
+    """Creates a result sink from its json description. spec is either
+       None for keeping the results in memory, a file name (.jsonl or
+       .sqlite / .db) or a dict with the entry "type" (one of sinkTypes)
+       and the constructor parameters of the sink, p.a.
+       {"type": "sqlite", "filename": "results.db", "bufferSize": 10}"""
+    if spec is None:
+        return MemorySink()
+
+    if isinstance(spec, str):
+        extension = os.path.splitext(spec)[1]
+        if extension == ".jsonl":
+            return JsonLinesSink(spec)
+        elif extension in (".sqlite", ".db"):
+            return SqliteSink(spec)
+        else:
+            raise ValueError(
+                "Can not derive result sink from file name '%s', use .jsonl, "
+                ".sqlite or .db." % (spec))
+
+    parameters = dict(spec)
+    try:
+        klass = sinkTypes[parameters.pop("type")]
+    except KeyError:
+        raise ValueError(
+            "Result sink needs an entry \"type\" with one of %s, got %s."
+            % (", ".join(sinkTypes), spec))
+    logging.debug("Using result sink %s." % (klass.__name__))
+    return klass(**parameters)
@@ -0,0 +1,169 @@
+import time
+import queue
+import logging
+import resource
+
+import jsonpointer
+
+from collections import deque
+
+from . import json_names
+
+# %limits entries declaring the memory of a job, RLIMIT_ entries are
+# [soft, hard] limits
+memoryLimits = ("RLIMIT_AS", "RLIMIT_VMEM", "CGROUP_MEMORY_MAX")
+
+
+def declaredMemory(config, limitsConfig=json_names.limitsConfig.text):
+    """Returns the memory in bytes the configuration declares in its
+       limits, 0 if it declares none."""
+    limits = jsonpointer.resolve_pointer(config, limitsConfig, None)
+    if not isinstance(limits, dict):
+        return 0
+
+    memory = 0
+    for key in memoryLimits:
+        value = limits.get(key, None)
+        if isinstance(value, (list, tuple)):
+            value = value[0] if len(value) > 0 else None
+        if not isinstance(value, (int, float)) or value < 0 \
+                or value == resource.RLIM_INFINITY:
+            continue
+        memory = max(memory, value)
+    return memory
+
+
+class _PendingJob(object):
+    def __init__(self, args, memory):
+        self.args = args
+        self.memory = memory
+        # number of jobs started before this one although it was waiting
+        self.bypassed = 0
+
+
+class AdmissionScheduler(object):
+    """Runs jobs on a pool like Pool.imap_unordered, but starts a job only
+       when at most window jobs are started and not finished and when its
+       declared memory fits into what is left of budget. Jobs that are
+       started and still wait in the pool count as using their memory.
+
+       Jobs are taken from a lookahead queue, smaller jobs may start
+       before a larger one that does not fit yet (backfilling). After a job
+       was bypassed maxBypass times no further jobs are started before it,
+       so large jobs do not starve. A job larger than budget is started
+       when nothing else runs."""
+    def __init__(self, pool, func, numProcessors, budget, window=None,
+                 lookahead=None, maxBypass=None):
+        self.pool = pool
+        self.func = func
+        self.numProcessors = numProcessors
+        self.budget = budget
+        self.window = window if window is not None else 2 * numProcessors
+        self.lookahead = lookahead if lookahead is not None \
+            else 4 * self.window
+        self.maxBypass = maxBypass if maxBypass is not None \
+            else 2 * numProcessors
+
+        self.finished = queue.Queue()
+        self.numRunning = 0
+        self.usedMemory = 0
+        self.numJobs = 0
+        self.numBackfilled = 0
+        # integrals over time for the packing efficiency
+        self.startTime = time.monotonic()
+        self.lastChange = self.startTime
+        self.memoryTime = 0.0
+        self.busyTime = 0.0
+
+    def account(self):
+        now = time.monotonic()
+        elapsed = now - self.lastChange
+        self.memoryTime += self.usedMemory * elapsed
+        self.busyTime += min(self.numRunning, self.numProcessors) * elapsed
+        self.lastChange = now
+
+    def fits(self, memory):
+        return self.numRunning == 0 \
+            or self.usedMemory + memory <= self.budget
+
+    def start(self, job):
+        self.account()
+        self.numRunning += 1
+        self.usedMemory += job.memory
+        self.numJobs += 1
+        memory = job.memory
+        self.pool.apply_async(
+            self.func, job.args,
+            callback=lambda result: self.finished.put(
+                (True, result, memory)),
+            error_callback=lambda error: self.finished.put(
+                (False, error, memory)))
+
+    def admit(self, pending):
+        """Starts jobs of pending while there is room for them."""
+        while len(pending) > 0 and self.numRunning < self.window:
+            chosen = None
+            for idx, job in enumerate(pending):
+                if self.fits(job.memory):
+                    chosen = idx
+                    break
+                if job.bypassed >= self.maxBypass:
+                    # reserve the room for this job
+                    break
+            if chosen is None:
+                return
+
+            if chosen > 0:
+                self.numBackfilled += 1
+                for idx in range(chosen):
+                    pending[idx].bypassed += 1
+            job = pending[chosen]
+            del pending[chosen]
+            self.start(job)
+
+    def collect(self):
+        success, value, memory = self.finished.get()
+        self.account()
+        self.numRunning -= 1
+        self.usedMemory -= memory
+        if not success:
+            raise value
+        return value
+
+    def imap(self, jobs):
+        """jobs yields tuples (args, memory) of the arguments to func and
+           the declared memory of the job. Yields the results of the jobs
+           as they finish."""
+        jobs = iter(jobs)
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < self.lookahead:
+                try:
+                    args, memory = next(jobs)
+                except StopIteration:
+                    exhausted = True
+                else:
+                    pending.append(_PendingJob(args, memory))
+
+            self.admit(pending)
+            if self.numRunning == 0:
+                break
+            yield self.collect()
+
+        self.logEfficiency()
+
+    def logEfficiency(self):
+        self.account()
+        elapsed = self.lastChange - self.startTime
+        if elapsed <= 0 or self.numJobs == 0:
+            return
+        logging.info(
+            "Ran %d jobs in %.1fs (%d started before larger waiting jobs), "
+            "on average %.1f%% of %d processors busy and %.1f%% of the "
+            "memory budget of %d MiB declared." % (
+                self.numJobs, elapsed, self.numBackfilled,
+                100.0 * self.busyTime / (elapsed * self.numProcessors),
+                self.numProcessors,
+                100.0 * self.memoryTime / (elapsed * self.budget),
+                self.budget // 2 ** 20))
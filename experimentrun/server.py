@@ -1,35 +1,247 @@
+"""Node daemon serving jobs of ClusterDispatcher. Start a name server
+using python -m Pyro4.naming and on each node
+
+    python -m experimentrun.server --preimport mytools
+
+Every slot is a process pinned to one cpu, registered as jobdispatcher.
+A slot keeps a warm zygote process with the tools already imported, each
+job runs in a child forked from the zygote, so changes of the working
+directory, sys.path or module state do not leak into later jobs. Forking
+needs a POSIX system, elsewhere the jobs run in the slot process itself.
+"""
 import Pyro4
 import os
 import psutil
 import socket
 import logging
 import sys
+import time
+import pickle
+import argparse
+import importlib
+import threading
+import traceback
+import multiprocessing
+
+from collections import OrderedDict
 
 from multiprocessing import Process
 
 from . import framework
+from . import json_names
+from . import topology
+
+# the topology.place result of this server process
+_placement = None
+
+
+class UnknownTemplate(KeyError):
+    """The template of a job was evicted or never uploaded."""
+    pass
+
+
+def runJob(config, workingDirectory, configPath):
+    os.chdir(workingDirectory)
+    return framework.bootstrap(config, configPath)
+
+
+def forkJob(config, workingDirectory, configPath):
+    """Runs the job in a forked child and returns (success, result or
+       exception)."""
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(reader)
+            try:
+                result = (True, runJob(config, workingDirectory, configPath))
+                data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            except BaseException as e:
+                if not isinstance(e, Exception):
+                    # p.a. sys.exit on configuration errors, which must
+                    # not stop the slot
+                    e = RuntimeError("Job stopped with %s." % (repr(e)))
+                try:
+                    data = pickle.dumps((False, e), pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    data = pickle.dumps((False, RuntimeError("".join(
+                        traceback.format_exception(
+                            type(e), e, e.__traceback__)))))
+            with os.fdopen(writer, 'wb') as pipe:
+                pipe.write(data)
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(0)
+
+    os.close(writer)
+    with os.fdopen(reader, 'rb') as pipe:
+        data = pipe.read()
+    pid, status = os.waitpid(pid, 0)
+    if len(data) == 0:
+        return (False, RuntimeError(
+            "Job process died with exit code %d."
+            % (os.waitstatus_to_exitcode(status))))
+    return pickle.loads(data)
+
+
+def zygoteLoop(connection):
+    """Serves the requests of a Zygote until the connection is closed."""
+    while True:
+        try:
+            request, args = connection.recv()
+        except EOFError:
+            return
+        if request == "run":
+            connection.send(forkJob(*args))
+        elif request == "include":
+            sys.path.extend(args)
+            connection.send((True, None))
+
 
-# start nameserver using: python -m Pyro4.naming
+class Zygote(object):
+    """A single threaded process forking a child for each job. It is
+       started before any threads, so the children are forked safely and
+       inherit everything imported so far. Needs os.fork, see
+       Zygote.supported."""
+    def __init__(self):
+        self.connection, child = multiprocessing.Pipe()
+        # forked itself, so it has the modules imported by the slot
+        self.process = multiprocessing.get_context("fork").Process(
+            target=zygoteLoop, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        # one job at a time, a slot has one cpu
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def supported():
+        return hasattr(os, "fork") \
+            and "fork" in multiprocessing.get_all_start_methods()
+
+    def call(self, request, *args):
+        with self.lock:
+            try:
+                self.connection.send((request, args))
+                success, value = self.connection.recv()
+            except (EOFError, OSError):
+                raise RuntimeError("The zygote of this slot died.")
+        if not success:
+            raise value
+        return value
 
 
 @Pyro4.expose
+@Pyro4.behavior(instance_mode="single")
 class JobDispatcher():
-    def run(self, config, workingDirectory):
-        os.chdir(workingDirectory)
-        return framework.bootstrap(config)
+    # asynchronous calls use a new connection each, so the uploaded
+    # templates are kept by a single instance for all connections
+    maxTemplates = 64
+
+    def __init__(self, zygote=None):
+        # explosion plans of the uploaded templates by key
+        self.plans = OrderedDict()
+        self.plansLock = threading.Lock()
+        # batches of different connections run one after the other
+        self.batchLock = threading.Lock()
+        self.zygote = zygote
+
+    def run(self, config, workingDirectory, configPath=None):
+        return self.runJob(config, workingDirectory, configPath)
+
+    def runIndexed(self, templateKey, template, index, workingDirectory,
+                   configPath):
+        """Runs the exploded configuration index of the template stored
+           under templateKey. The template is only sent with the first job
+           using it, afterwards it is reused."""
+        with self.plansLock:
+            if templateKey in self.plans:
+                self.plans.move_to_end(templateKey)
+            elif template is not None:
+                self.plans[templateKey] = framework.ExplosionPlan(template)
+                while len(self.plans) > self.maxTemplates:
+                    self.plans.popitem(last=False)
+            else:
+                raise UnknownTemplate(templateKey)
+            plan = self.plans[templateKey]
+        return self.runJob(plan[index], workingDirectory, configPath)
+
+    def ping(self):
+        """Health check of ClusterDispatcher."""
+        return True
+
+    def runBatch(self, jobs):
+        """Runs jobs, a list of [method, args] calling run or runIndexed,
+           one after the other. Returns [status, result, seconds] for each
+           job, status is "ok", "error" or "unknownTemplate" if the
+           template has to be uploaded again. The result of a failed job
+           is its error message."""
+        outcomes = list()
+        with self.batchLock:
+            for method, args in jobs:
+                if method not in ("run", "runIndexed"):
+                    raise ValueError("Unknown job method %s." % (method))
+                start = time.monotonic()
+                try:
+                    result = getattr(self, method)(*args)
+                    status = "ok"
+                except UnknownTemplate as e:
+                    result = "Unknown template %s." % (e)
+                    status = "unknownTemplate"
+                except Exception as e:
+                    result = "%s: %s" % (type(e).__name__, e)
+                    status = "error"
+                outcomes.append(
+                    [status, result, time.monotonic() - start])
+        return outcomes
+
+    def runJob(self, config, workingDirectory, configPath):
+        self.placed(config)
+        if self.zygote is None:
+            return runJob(config, workingDirectory, configPath)
+        return self.zygote.call("run", config, workingDirectory, configPath)
+
+    def placed(self, config):
+        """Records the placement of this server in config."""
+        if _placement is not None:
+            config[json_names.exrunPlacement.text] = _placement
+        return config
 
     def setIncludes(self, includes):
+        includes = [path for path in includes if path not in sys.path]
         sys.path.extend(includes)
+        if self.zygote is not None:
+            self.zygote.call("include", includes)
 
 
-def start(core):
+def start(cpu, includes=(), preimport=(), host=None):
+    """Serves jobs on cpu, a cpu id or a topology.Cpu whose node also
+       gets the memory of the jobs. The modules preimport are imported
+       before the zygote is started."""
+    global _placement
     name = socket.gethostname()
-    process = psutil.Process()
-    process.cpu_affinity([core])
+    if isinstance(cpu, topology.Cpu):
+        _placement = topology.place(cpu)
+        core = cpu.cpu
+    else:
+        core = cpu
+        process = psutil.Process()
+        process.cpu_affinity([core])
 
-    daemon = Pyro4.Daemon(host=name)
+    sys.path.extend(includes)
+    importlib.import_module("experimentrun.tools")
+    for module in preimport:
+        importlib.import_module(module)
+    zygote = None
+    if Zygote.supported():
+        zygote = Zygote()
+    else:
+        logging.warning("Can not fork jobs on this system, they run in the "
+                        "slot process.")
+
+    daemon = Pyro4.Daemon(host=host if host is not None else name)
     ns = Pyro4.locateNS()
-    uri = daemon.register(JobDispatcher)
+    uri = daemon.register(JobDispatcher(zygote))
     ns.register(
         name + "-" + str(core) +
         ".jobdispatcher", uri, metadata=['jobdispatcher'])
@@ -37,18 +249,89 @@ def start(core):
     daemon.requestLoop()
 
 
+def selectSlots(args):
+    """Returns the cpus of the slots selected on the command line."""
+    if args.cpus is not None:
+        cpus = topology.parseCpuList(args.cpus)
+        known = {cpu.cpu: cpu for cpu in
+                 topology.readTopology(allowed=set(cpus))}
+        return [known.get(cpu, cpu) for cpu in cpus]
+    return topology.selectCpus(args.slots, args.placement)
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Serve jobs of ClusterDispatcher on this node.")
+    parser.add_argument(
+        '-n', '--slots',
+        help="Number of slots, by default one per physical core.",
+        type=int,
+        default=None
+    )
+    parser.add_argument(
+        '--cpus',
+        help="List of cpus to start a slot on each, p.a. 0-3,8. Overrides "
+             "--slots.",
+        default=None
+    )
+    parser.add_argument(
+        '-p', '--placement',
+        help="Spread the slots over the NUMA nodes and caches or pack them.",
+        choices=["spread", "pack"],
+        default="spread"
+    )
+    parser.add_argument(
+        '-m', '--preimport',
+        action="append",
+        help="Module to import before forking jobs, p.a. the modules of "
+             "used tools.",
+        default=list()
+    )
+    parser.add_argument(
+        '-I', '--include',
+        action="append",
+        help='List of folders to add to path.',
+        default=list()
+    )
+    parser.add_argument(
+        '--host',
+        help="Host name or address to listen on.",
+        default=None
+    )
+    parser.add_argument(
+        '-d', '--debug',
+        help="Print lots of debugging statements",
+        action="store_const", dest="loglevel", const=logging.DEBUG,
+        default=logging.WARNING,
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        help="Be verbose",
+        action="store_const", dest="loglevel", const=logging.INFO,
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel)
     logging.getLogger("Pyro4").setLevel(logging.WARN)
     logging.getLogger("Pyro4.core").setLevel(logging.WARN)
 
-    p1 = Process(target=start, args=(0,))
-    p1.start()
-
-    p2 = Process(target=start, args=(4,))
-    p2.start()
+    try:
+        slots = selectSlots(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(slots) == 0:
+        parser.error("No cpus for slots.")
+    logging.info("Starting slots on cpus %s." % (
+        ", ".join(str(getattr(cpu, "cpu", cpu)) for cpu in slots)))
 
-    p1.join()
-    p2.join()
+    includes = [os.path.abspath(path) for path in args.include]
+    servers = [Process(target=start,
+                       args=(cpu, includes, args.preimport, args.host))
+               for cpu in slots]
+    for server in servers:
+        server.start()
+    for server in servers:
+        server.join()
 
 
 if __name__ == "__main__":
@@ -11,18 +11,86 @@ import os
 import signal
 import re
 import random
+import shlex
+import shutil
 import sys
 
 import jsonpointer
 
 import multiprocessing
-import Pyro4
 import threading
+import pickle
+import functools
 
 from copy import deepcopy
+from multiprocessing import shared_memory
 
 from . import json_names
 from . import framework
+from . import results
+from . import journal
+from . import executor
+from . import capture
+from . import cluster
+from . import hoist
+from . import cgroups
+from . import scheduler
+from . import topology
+
+
+@functools.lru_cache(maxsize=4096)
+def parsePointer(accessorString):
+    """Returns the JsonPointer for accessorString. Pointers are cached and
+       shared, do not modify the returned pointer."""
+    return jsonpointer.JsonPointer(accessorString)
+
+
+def _walk(pointer, doc, part):
+    """pointer.walk(doc, part) with a fast path for existing dict entries."""
+    if type(doc) is dict and part in doc:
+        return doc[part]
+    return pointer.walk(doc, part)
+
+
+_templatePlaceholder = re.compile(r"(\$|%){([^{}]*)}")
+_templateSpecial = re.compile(r"[{}$%]")
+
+
+@functools.lru_cache(maxsize=4096)
+def _compileTemplate(text):
+    """Splits text into literals and placeholders for Tool.substitute.
+       Placeholders are tuples (kind, value, source), value is the parsed
+       json pointer for ${..} and the compiled expression for %{..}.
+       Returns None if the text can not be handled in a single pass, i.e. it
+       contains line breaks (which the reference implementation does not
+       handle consistently) or braces outside of placeholders."""
+    if "\n" in text:
+        return None
+
+    literals = list()
+    placeholders = list()
+    last = 0
+    for match in _templatePlaceholder.finditer(text):
+        literals.append(text[last:match.start()])
+        if match.group(1) == "$":
+            try:
+                value = parsePointer(match.group(2))
+            except jsonpointer.JsonPointerException:
+                # let access raise the error when the placeholder is used
+                value = match.group(2)
+        else:
+            try:
+                value = compile(match.group(2), "<substitute>", "eval")
+            except SyntaxError:
+                return None
+        placeholders.append((match.group(1), value, match.group(0)))
+        last = match.end()
+    literals.append(text[last:])
+
+    for literal in literals:
+        if "{" in literal or "}" in literal:
+            return None
+    return (literals, placeholders)
 
 
 class Tool(object):
@@ -54,6 +122,43 @@ class Tool(object):
 
     def substitute(self, text):
         """Substitute text with data from the json file."""
+        if "{" not in text:
+            return text
+
+        template = _compileTemplate(text)
+        if template is None:
+            return self.substituteSlow(text)
+
+        literals, placeholders = template
+        # placeholders are replaced from the last to the first, like the
+        # reference implementation does, pieces holds the result reversed
+        pieces = [literals[-1]]
+        for idx in range(len(placeholders) - 1, -1, -1):
+            kind, value, source = placeholders[idx]
+            if kind == "$":
+                replacement = str(self.access(value))
+            else:
+                replacement = str(eval(value, globals(),
+                                       {"self": self, "text": text}))
+
+            if _templateSpecial.search(replacement):
+                # the replacement might form new placeholders, continue
+                # with the reference implementation
+                prefix = "".join(
+                    literals[i] + placeholders[i][2] for i in range(idx))
+                pieces.append(replacement)
+                pieces.append(literals[idx])
+                pieces.append(prefix)
+                return self.substituteSlow("".join(reversed(pieces)))
+
+            pieces.append(replacement)
+            pieces.append(literals[idx])
+        return "".join(reversed(pieces))
+
+    def substituteSlow(self, text):
+        """Substitute text with data from the json file. Reference
+           implementation that rescans the whole text after each
+           replacement."""
         pattern = re.compile(r"(.*)(\$|%){([^{}]*)}(.*)")
         while True:
             match = pattern.match(text)
@@ -68,24 +173,24 @@ class Tool(object):
         return text
 
     def setValue(self, accessorString, value):
-        pointer = jsonpointer.JsonPointer(accessorString)
+        pointer = parsePointer(accessorString)
         doc = self.config
         parts = pointer.parts
         for part in parts[:-1]:
             try:
-                doc = pointer.walk(doc, part)
+                doc = _walk(pointer, doc, part)
             except jsonpointer.JsonPointerException:
                 doc[part] = dict()
                 doc = doc[part]
         doc[parts[-1]] = value
 
     def deleteEntry(self, accessorString, ignoreNonExisting=True):
-        pointer = jsonpointer.JsonPointer(accessorString)
+        pointer = parsePointer(accessorString)
         doc = self.config
         parts = pointer.parts
         for part in parts[:-1]:
             try:
-                doc = pointer.walk(doc, part)
+                doc = _walk(pointer, doc, part)
             except jsonpointer.JsonPointerException as e:
                 if ignoreNonExisting:
                     return
@@ -96,10 +201,10 @@ class Tool(object):
             del doc[parts[-1]]
         except IndexError:
             if not ignoreNonExisting:
-                raise JsonPointerException("index '%s' is out of bounds" % (parts[-1], ))
+                raise jsonpointer.JsonPointerException("index '%s' is out of bounds" % (parts[-1], ))
         except KeyError:
             if not ignoreNonExisting:
-                raise JsonPointerException("member '%s' not found in %s" % (parts[-1], doc))
+                raise jsonpointer.JsonPointerException("member '%s' not found in %s" % (parts[-1], doc))
 
     def getValue(self, accessorString, createMissing=False):
         return self.access(accessorString, createMissing)
@@ -110,21 +215,24 @@ class Tool(object):
         if isinstance(accessorString, jsonpointer.JsonPointer):
             pointer = accessorString
         else:
-            pointer = jsonpointer.JsonPointer(accessorString)
+            pointer = parsePointer(accessorString)
         if (pointer.parts == ['']):
             return self.config
         if not createMissing:
             try:
-                return pointer.resolve(self.config)
+                doc = self.config
+                for part in pointer.parts:
+                    doc = _walk(pointer, doc, part)
+                return doc
             except:
                 raise KeyError(
                     "Tried to access '%s' in json file."
-                    % (accessorString))
+                    % (pointer.path))
         else:
             doc = self.config
             for part in pointer.parts:
                 try:
-                    doc = pointer.walk(doc, part)
+                    doc = _walk(pointer, doc, part)
                 except jsonpointer.JsonPointerException:
                     doc[part] = dict()
                     doc = doc[part]
@@ -188,7 +296,13 @@ class PrintExplodedJsons(Tool):
         super().__init__()
 
     def run(self):
-        print(json.dumps(framework.explodeConfig(self.config), indent=4))
+        print("[", end="")
+        separator = "\n"
+        for conf in framework.iterExplodedConfigs(self.config):
+            text = json.dumps(conf, indent=4).replace("\n", "\n    ")
+            print(separator + "    " + text, end="")
+            separator = ",\n"
+        print("\n]" if separator != "\n" else "]")
 
 def explode(context, path = "/"):
     context.setValue(path, framework.explodeConfig(context.getValue(path)))
@@ -238,6 +352,9 @@ def mergeConfig(default, additional):
 
 
 class Eval(Tool):
+    # the entries hoist.InvariantHoister may evaluate in advance
+    hoistMarkers = (json_names.evaluate.text,)
+
     def __init__(self, basePtr=""):
         super().__init__()
         self.basePtr = basePtr
@@ -269,6 +386,9 @@ class LoopInLinksException(Exception):
 
 
 class ResolveLinks(Tool):
+    # the entries hoist.InvariantHoister may resolve in advance
+    hoistMarkers = (json_names.link.text, json_names.linkFile.text)
+
     def __init__(self, basePtr=""):
         super().__init__()
         self.basePtr = basePtr
@@ -296,7 +416,7 @@ class ResolveLinks(Tool):
         linkText = json_names.link.text
         path = data[key][linkText]
 
-        pointer = jsonpointer.JsonPointer(self.substitute(path))
+        pointer = parsePointer(self.substitute(path))
         current = self.config
         parts = pointer.parts
         try:
@@ -317,7 +437,7 @@ class ResolveLinks(Tool):
     def loadData(self, data, key):
         linkText = json_names.linkFile.text
         file = self.substitute(data[key][linkText])
-        data[key] = framework.loadJson(file)
+        data[key] = framework.loadJsonCached(file)
         self.search(data[key])
 
     def handleKey(self, data, key):
@@ -349,89 +469,350 @@ class ResolveLinks(Tool):
             self.search(self.access(ptr))
 
 
-class ClusterDispatcher(object):
-    def __init__(self, resultStorage):
-        self.resultStorage = resultStorage
-        self.storageLock = threading.Lock()
-
-        logging.getLogger("Pyro4").setLevel(logging.WARN)
-        logging.getLogger("Pyro4.core").setLevel(logging.WARN)
-        ns = Pyro4.locateNS()
-        self.aviableDispatchers = set()
-        self.freeDispatchers = list()
-
-        lookup = ns.list(metadata_all={"jobdispatcher"})
-        for uri in lookup.values():
-            proxy = Pyro4.Proxy(uri)
-            # async is a reserved word in 3.7
-            getattr(Pyro4, 'async')(proxy)
-            proxy.setIncludes(framework.includes)
-            self.aviableDispatchers.add(proxy)
-            self.freeDispatchers.append(proxy)
-
-        self.cv = threading.Condition()
-
-    def release(self, result, dispatcher):
-        with self.cv:
-            self.freeDispatchers.append(dispatcher)
-            self.cv.notify()
-        return result
+# explosion plans of the templates in a pool worker, see
+# ExplodeNBootstrap.attachTemplates
+_workerPlans = None
+# the topology.place result of a pool worker with automatic placement
+_workerPlacement = None
 
-    def store(self, result):
-        with self.storageLock:
-            self.resultStorage.append(result)
-
-    def handleException(self, exception, config, cwd, dispatcher):
-        logging.error("Got Remote Exception: " + str(exception))
-
-        # todo: this might be improved, i.e. look for aviable servers
-        # now and then
-        # make sure that the program knows when to terminate
-        self.aviableDispatchers.remove(dispatcher)
-
-        # reshedule
-        self.run(config, cwd)
-
-    def run(self, config, cwd):
-        with self.cv:
-            while len(self.freeDispatchers) == 0:
-                self.cv.wait()
-            dispatcher = self.freeDispatchers.pop()
-        dispatcher.run(config, cwd) \
-            .then(self.store) \
-            .then(self.release, dispatcher) \
-            .iferror(
-                (lambda config, cwd, dispatcher:
-                 lambda x: self.handleException(x, config, cwd, dispatcher)
-                )(config, cwd, dispatcher)
-            )
-
-    def wait(self):
-        with self.cv:
-            while len(self.freeDispatchers) != len(self.aviableDispatchers):
-                self.cv.wait()
 
-class ExplodeNBootstrap(Tool):
-    processor = None
+def _hasCgroupLimits(config):
+    """True if a dict in config has a CGROUP_ key."""
+    if isinstance(config, dict):
+        return any(isinstance(key, str) and key.startswith("CGROUP_")
+                   or _hasCgroupLimits(value)
+                   for key, value in config.items())
+    if isinstance(config, list):
+        return any(_hasCgroupLimits(value) for value in config)
+    return False
+
 
+class ExplodeNBootstrap(Tool):
     def __init__(self, parallel=False, processors=None,
-                 cluster=False):
+                 cluster=False, shard=None, resultSink=None,
+                 resultCache=None, journal=None, resume=None, hoist=False,
+                 asyncShell=False, memoryBudget=None, placement="spread"):
+        """ If shard is given as "k/n" (or [k, n]) only every n-th exploded
+        configuration, starting at the k-th, is run. The numbering goes
+        over all configuration blocks, so the shards are balanced and
+        deterministic. Without shard parameter the shard selected on the
+        command line (EXRUN_SHARD) is used.
+
+        resultSink selects where the result of each run is stored as soon as
+        it finishes, see results.createSink. By default the results are
+        kept in memory and stored to "runResults" in the end.
+
+        resultCache is the file name of a persistent cache of results, keyed
+        by the hash of the exploded configuration. Configurations with a
+        cached result are not run again, the cached result is reused.
+
+        journal is the file name of a progress journal recording dispatch
+        and completion of each configuration. With resume the
+        configurations recorded as completed are skipped (their results
+        are expected to be in the result sink already, so resuming needs a
+        resultSink that is not kept in memory). Both default to the command
+        line options (EXRUN_JOURNAL, EXRUN_RESUME).
+
+        With hoist the %link, %linkFile and %eval entries that do not
+        depend on %explode entries are evaluated once per configuration
+        block before exploding, see hoist.InvariantHoister. The hashes of the
+        exploded configurations change, so do not switch hoist when using
+        a result cache or resuming.
+
+        With asyncShell the configurations run in this process and the
+        commands of their RunShell tools run concurrently, supervised by
+        an asyncio event loop (see executor.ShellExecutor). Each processor
+        is a slot for one configuration and its commands are pinned to
+        it, without processors there is one unpinned slot per cpu.
+
+        In the parallel pool a configuration is only started when the
+        memory it declares in %limits (RLIMIT_AS, RLIMIT_VMEM or
+        CGROUP_MEMORY_MAX) fits into memoryBudget (bytes, by default the
+        available memory) besides the running ones, see
+        scheduler.AdmissionScheduler.
+
+        With processors "auto" (or a number of processors) the processors
+        are selected from the cpu topology, one logical cpu per physical
+        core, spread over the NUMA nodes and caches or packed onto as few
+        as possible depending on placement ("spread" or "pack"). Each
+        worker allocates its memory on the node of its cpu and the
+        placement is recorded in the results (EXRUN_PLACEMENT).
+        """
         super().__init__()
         self.parallel = parallel
         self.processors = processors
         self.cluster = cluster
-
-    def initialize(processors):
+        self.shard = shard
+        self.resultSink = resultSink
+        self.resultCache = resultCache
+        self.journalFile = journal
+        self.resume = resume
+        self.hoist = hoist
+        self.asyncShell = asyncShell
+        self.memoryBudget = memoryBudget
+        self.placement = placement
+
+    def selectProcessors(self):
+        """Returns the processors as list of cpu ids or, for automatic
+           placement, of topology.Cpu."""
+        if isinstance(self.processors, bool):
+            # would be taken as 0 or 1 processors
+            raise ValueError(
+                "processors is a list of cpu ids, a number of cpus or "
+                "\"auto\", got %s." % (self.processors))
+        if self.processors == "auto":
+            return topology.selectCpus(policy=self.placement)
+        if isinstance(self.processors, int):
+            return topology.selectCpus(self.processors, self.placement)
+        return self.processors
+
+    def initialize(processors, templates=None):
+        global _workerPlacement
         if processors is not None:
-            processorId = processors.get()
-            process = psutil.Process()
-            process.cpu_affinity([processorId])
+            processor = processors.get()
+            if isinstance(processor, topology.Cpu):
+                _workerPlacement = topology.place(processor)
+            else:
+                process = psutil.Process()
+                process.cpu_affinity([processor])
             print("initialized process")
+        if templates is not None:
+            ExplodeNBootstrap.attachTemplates(*templates)
+
+    def attachTemplates(name, size):
+        """Loads the templates broadcast by shareTemplates into the worker
+           and compiles their explosion plans."""
+        global _workerPlans
+        try:
+            # the parent owns the segment and unlinks it
+            memory = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # before python 3.13 the segment is always registered, but pool
+            # workers share the resource tracker of the parent, where it is
+            # registered already. Unregistering it here would drop that
+            # registration and make the unlink of the parent fail.
+            memory = shared_memory.SharedMemory(name)
+        try:
+            with memory.buf[:size] as data:
+                templates = pickle.loads(data)
+        finally:
+            memory.close()
+        _workerPlans = [framework.ExplosionPlan(template)
+                        for template in templates]
 
     def doWork(config, cwd, configPath):
         os.chdir(cwd)
         return framework.bootstrap(config, configPath)
 
+    def doJob(key, block, index, cwd, configPath):
+        config = _workerPlans[block][index]
+        if _workerPlacement is not None:
+            config[json_names.exrunPlacement.text] = _workerPlacement
+        return (key, ExplodeNBootstrap.doWork(config, cwd, configPath))
+
+    def shareTemplates(self):
+        """Puts the templates of all blocks into shared memory, so each
+           worker loads them once instead of receiving every exploded
+           configuration. Returns the initializer argument for workers."""
+        data = pickle.dumps(self.templates, pickle.HIGHEST_PROTOCOL)
+        self.sharedTemplates = shared_memory.SharedMemory(
+            create=True, size=max(1, len(data)))
+        self.sharedTemplates.buf[:len(data)] = data
+        return (self.sharedTemplates.name, len(data))
+
+    def knownLinkFiles(self, config):
+        """Yields the files of %linkFile entries in config whose path is
+           known before exploding. Relative paths are resolved against the
+           working directory, like the jobs resolve them."""
+        for linkFile in framework.findLinkFiles(config):
+            try:
+                linkFile = self.substitute(linkFile)
+            except Exception:
+                # depends on values of the exploded configuration
+                continue
+            linkFile = os.path.abspath(linkFile)
+            if os.path.isfile(linkFile):
+                yield linkFile
+
+    def preloadLinkFiles(self):
+        """Loads the files of %linkFile entries whose path is known before
+           exploding into the json cache, so pool workers inherit them
+           instead of parsing them again."""
+        for linkFile in self.knownLinkFiles(self.config):
+            framework.loadJsonCached(linkFile)
+
+    def prepareCgroups(self):
+        """Sets up the cgroup hierarchy before the workers are forked if a
+           template has CGROUP_ limits, so all workers create their jobs in
+           the same hierarchy. The limits may be anywhere in the template,
+           p.a. in the options of %explode, or in a linked file. Otherwise
+           each worker sets up the hierarchy on first use."""
+        for template in self.templates:
+            if _hasCgroupLimits(template) or any(
+                    _hasCgroupLimits(framework.loadJsonCached(linkFile))
+                    for linkFile in self.knownLinkFiles(template)):
+                cgroups.manager()
+                return
+
+    def getPool(self):
+        """Returns the worker pool, it is created on first use and reused
+           for the jobs of all configuration blocks."""
+        if getattr(self, "pool", None) is None:
+            self.preloadLinkFiles()
+            self.prepareCgroups()
+
+            processors = self.selectProcessors()
+            if processors is None:
+                processorQueue = None
+                self.numProcessors = os.cpu_count() or 1
+            else:
+                self.numProcessors = len(processors)
+                # the queue is inherited by the workers when they are
+                # started, each worker takes one processor from it
+                processorQueue = multiprocessing.Queue()
+                for i in processors:
+                    processorQueue.put(i)
+
+            # for cluster parallelism use http://stackoverflow.com/questions/5181949/using-the-multiprocessing-module-for-cluster-computing
+            self.pool = multiprocessing.Pool(
+                processes=self.numProcessors,
+                initializer=ExplodeNBootstrap.initialize,
+                initargs=(processorQueue, self.shareTemplates()))
+        return self.pool
+
+    def shutdownPool(self, wait=True):
+        """Stops the worker pool. If wait is True outstanding jobs are
+           finished first, otherwise the workers are terminated."""
+        pool = getattr(self, "pool", None)
+        if pool is not None:
+            self.pool = None
+            if wait:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+            # workers started after a crash of another one attach to the
+            # templates again, so they are kept until the pool is stopped
+            self.sharedTemplates.close()
+            self.sharedTemplates.unlink()
+            self.sharedTemplates = None
+
+    def loadTemplates(self):
+        """Sets templates to the configuration blocks merged with the
+           default configuration and plans to their explosion plans."""
+        self.templates = list()
+        self.plans = list()
+        for config in self.config.get("configurations", list()):
+            config = mergeConfig(
+                self.config.get("default_configuration", None), config)
+            if self.hoist:
+                # the template shares entries with the other blocks
+                config = deepcopy(config)
+                numHoisted = hoist.InvariantHoister(
+                    config, self.config[json_names.exrunConfDir.text]).run()
+                logging.debug("Hoisted %d invariant entries." % (numHoisted))
+
+            self.templates.append(config)
+            self.plans.append(framework.ExplosionPlan(config))
+
+    def jobs(self):
+        """Yields the configurations to run as tuple (index, block, i), the
+           configuration is self.plans[block][i]. The configurations of all
+           blocks are numbered consecutively, only those of the selected
+           shard are yielded."""
+        shard = self.shard
+        if shard is None:
+            shard = self.config.get(json_names.exrunShard.text, None)
+        if shard is not None:
+            shardIdx, numShards = framework.parseShard(shard)
+            logging.info("Running shard %d/%d." % (shardIdx, numShards))
+        else:
+            shardIdx, numShards = 1, 1
+
+        offset = 0
+        for block, plan in enumerate(self.plans):
+            first = (shardIdx - 1 - offset) % numShards
+            for i in range(first, plan.count, numShards):
+                yield (offset + i, block, i)
+            offset += plan.count
+
+    def pendingJobs(self):
+        """Yields the jobs that still need to run, jobs with a cached result
+           are finished immediately."""
+        numCached = 0
+        numResumed = 0
+        for key, block, index in self.jobs():
+            if self.cache is not None or self.journal is not None:
+                # the variant shares entries with the template, hashing
+                # does not modify it
+                configHash = framework.configHash(
+                    self.plans[block].root.variant(index))
+                if (key, configHash) in self.completed:
+                    numResumed += 1
+                    continue
+                with self.jobLock:
+                    cached = None
+                    if self.cache is not None:
+                        cached = self.cache.get(configHash)
+                    if cached is not None:
+                        numCached += 1
+                        self.sink.append(cached, key)
+                        continue
+                    self.jobHashes[key] = configHash
+                    if self.journal is not None:
+                        self.journal.dispatched(key, configHash)
+            yield (key, block, index)
+
+        if numResumed > 0:
+            logging.info("Skipped %d configurations completed before."
+                         % (numResumed))
+        if numCached > 0:
+            logging.info("Reused %d cached results." % (numCached))
+
+    def finishJob(self, key, result):
+        with self.jobLock:
+            self.sink.append(result, key)
+            configHash = self.jobHashes.pop(key, None)
+            if self.cache is not None:
+                self.cache.put(configHash, result)
+            if self.journal is not None:
+                self.journal.completed(key, configHash)
+
+    def openJournal(self):
+        journalFile = self.journalFile
+        if journalFile is None:
+            journalFile = self.config.get(json_names.exrunJournal.text, None)
+        resume = self.resume
+        if resume is None:
+            resume = self.config.get(json_names.exrunResume.text, False)
+
+        self.journal = None
+        self.completed = set()
+        if journalFile is None:
+            if resume:
+                raise RuntimeError("Can not resume without journal.")
+            return
+
+        if resume:
+            if isinstance(self.sink, results.MemorySink):
+                raise RuntimeError(
+                    "Can not resume with the results kept in memory, the "
+                    "results of the completed configurations are lost. "
+                    "Store them with resultSink.")
+            self.completed = journal.Journal.completedJobs(journalFile)
+            logging.info("Resuming from journal %s with %d completed "
+                         "configurations." % (journalFile, len(self.completed)))
+        # results must be durable before their completion is
+        self.journal = journal.Journal(
+            journalFile, append=resume, beforeSync=self.syncResults)
+
+    def syncResults(self):
+        """Writes the buffered results to the result sink and the result
+           cache."""
+        self.sink.sync()
+        if self.cache is not None:
+            self.cache.flush()
+
     def run(self):
         logging.info("Using processors %s." % (str(self.processors)))
 
@@ -442,60 +823,241 @@ class ExplodeNBootstrap(Tool):
                 "i.e. use [{..},{..},..]. Got %s" % (type(configurations)))
             raise RuntimeError("Critical log")
 
-        runResults = list()
-        for config in self.config.get("configurations", list()):
-            config = mergeConfig(
-                self.config.get("default_configuration", None), config)
+        self.sink = results.createSink(self.resultSink)
+        self.cache = None
+        self.jobHashes = dict()
+        # results may arrive on callback threads (ClusterDispatcher)
+        self.jobLock = threading.Lock()
+        if self.resultCache is not None:
+            self.cache = results.ResultCache(self.resultCache)
+        self.openJournal()
 
-            confs = framework.explodeConfig(config)
-            cwd = os.getcwd()
+        cwd = os.getcwd()
+        configPath = self.config[json_names.exrunConfDir.text]
+        self.loadTemplates()
+        jobs = self.pendingJobs()
 
-            if not self.parallel:
-                runResults.extend([
-                    ExplodeNBootstrap.doWork(conf, cwd, self.config[json_names.exrunConfDir.text])
-                    for conf in confs])
-            else:
-                if self.cluster:
-                    print("runing on cluster")
-                    cp = ClusterDispatcher(runResults)
-                    for conf in confs:
-                        cp.run(conf, cwd)
-                    cp.wait()
+        try:
+            if self.asyncShell:
+                if self.processors is None:
+                    shellExecutor = executor.ShellExecutor(
+                        range(os.cpu_count() or 1))
                 else:
-                    if self.processors is None:
-                        queue = None
-                        numProcessors = None  # use default i.e. num procs
-                    else:
-                        numProcessors = len(self.processors)
-                        manager = multiprocessing.Manager()
-                        queue = manager.Queue()
-                        for i in self.processors:
-                            queue.put(i)
-
-                    # for cluster parallelism use http://stackoverflow.com/questions/5181949/using-the-multiprocessing-module-for-cluster-computing
-                    p = multiprocessing.Pool(
-                        processes=numProcessors,
-                        initializer=ExplodeNBootstrap.initialize,
-                        initargs=(queue,))
-                    runResults.extend(p.starmap(
-                        ExplodeNBootstrap.doWork,
-                        [(conf, cwd, self.config[json_names.exrunConfDir.text]) for conf in confs]))
-
+                    shellExecutor = executor.ShellExecutor(
+                        self.selectProcessors(), pin=True)
+                shellExecutor.run(
+                    ((key, self.plans[block][index], cwd, configPath)
+                     for key, block, index in jobs),
+                    self.finishJob)
+            elif not self.parallel:
+                for key, block, index in jobs:
+                    self.finishJob(key, ExplodeNBootstrap.doWork(
+                        self.plans[block][index], cwd, configPath))
+            elif self.cluster:
+                print("runing on cluster")
+                cp = cluster.ClusterDispatcher(self.sink)
+                try:
+                    for key, block, index in jobs:
+                        cp.runIndexed(
+                            block, self.templates[block], index, cwd,
+                            configPath, functools.partial(self.finishJob, key))
+                    cp.wait()
+                finally:
+                    cp.close()
+            else:
+                pool = self.getPool()
+                budget = self.memoryBudget
+                if budget is None:
+                    budget = psutil.virtual_memory().available
+                admission = scheduler.AdmissionScheduler(
+                    pool, ExplodeNBootstrap.doJob, self.numProcessors, budget)
+                finished = False
+                try:
+                    # the workers have the templates, a job only needs the
+                    # block and index of its configuration
+                    for key, result in admission.imap(
+                            ((key, block, index, cwd, configPath),
+                             scheduler.declaredMemory(
+                                 self.plans[block].root.variant(index)))
+                            for key, block, index in jobs):
+                        self.finishJob(key, result)
+                    finished = True
+                finally:
+                    self.shutdownPool(wait=finished)
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+            self.sink.close()
+            if self.cache is not None:
+                self.cache.close()
             # reset working directory
             os.chdir(cwd)
-        self.config["runResults"] = runResults
+
+        if isinstance(self.sink, results.MemorySink):
+            self.config["runResults"] = self.sink.results
+        else:
+            logging.info("Stored run results to %s." % (self.sink.filename))
 
 
 class NonZeroExitCodeException(Exception):
     pass
 
+# characters that make bash do more than splitting words and removing quotes
+_shellSyntax = re.compile(r"[|&;<>()$`\\*?\[\]#~{}!\n]")
+# builtins and keywords, which behave differently or have no executable
+_shellWords = frozenset(("time", "command", "builtin", "eval", "source", ".",
+                         "cd", "echo", "printf", "test", "[", "kill"))
+
+
+def directArgv(commandString):
+    """Returns the argument list to execute commandString without a shell,
+       or None if it uses shell syntax or the program is not an executable.
+       A leading exec is removed."""
+    if _shellSyntax.search(commandString) is not None:
+        return None
+    try:
+        argv = shlex.split(commandString)
+    except ValueError:
+        return None
+    if len(argv) > 0 and argv[0] == "exec":
+        argv = argv[1:]
+    if len(argv) == 0 or "=" in argv[0] or argv[0] in _shellWords \
+            or shutil.which(argv[0]) is None:
+        return None
+    return argv
+
+
+def waitProcess(process, timeout=None, kill=None):
+    """Waits for process and returns its resource usage. The usage is that
+       of the process and its waited for children only, unlike
+       RUSAGE_CHILDREN it is not mixed up with other processes finishing
+       meanwhile. After timeout seconds kill is called, by default it kills
+       the process group of process."""
+    finished = threading.Event()
+
+    def killProcessGroup():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    if kill is None:
+        kill = killProcessGroup
+
+    def killOnTimeout():
+        if not finished.is_set():
+            kill()
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, killOnTimeout)
+        timer.start()
+    try:
+        pid, status, info = os.wait4(process.pid, 0)
+        finished.set()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return info
+
+
+# ru_maxrss is given in kilobytes on linux, in bytes on macOS
+_maxRssUnit = 1 if sys.platform == "darwin" else 1024
+
+
+def rusageInfo(info):
+    """Returns the memory, paging, io and scheduling figures of the
+       resource usage info as dict, sizes are in bytes. maxRss is the
+       peak of the largest single process, linux counts the memory of
+       this process at spawn time into it for short running children."""
+    return {
+        "maxRss": info.ru_maxrss * _maxRssUnit,
+        "majorFaults": info.ru_majflt,
+        "minorFaults": info.ru_minflt,
+        # block operations are counted in units of 512 bytes
+        "ioRead": info.ru_inblock * 512,
+        "ioWrite": info.ru_oublock * 512,
+        "voluntaryContextSwitches": info.ru_nvcsw,
+        "involuntaryContextSwitches": info.ru_nivcsw,
+    }
+
+
+class RssSampler(threading.Thread):
+    """Samples the summed resident memory of a process and all of its
+       descendants every interval seconds, maxRss is the largest sample
+       in bytes."""
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.maxRss = 0
+        self.stopped = threading.Event()
+
+    def sample(self):
+        try:
+            process = psutil.Process(self.pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return
+        rss = 0
+        for process in processes:
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                # finished meanwhile
+                pass
+        self.maxRss = max(self.maxRss, rss)
+
+    def run(self):
+        while True:
+            self.sample()
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
 class RunShell(Tool):
     def __init__(self, command, runInfoTo=None,
                  limitsConfig=json_names.limitsConfig.text,
                  externalUsedConfig=None,
-                 requireNormalExit=False):
+                 requireNormalExit=False,
+                 directExec=None,
+                 rssSampleInterval=None,
+                 stdoutTo=None,
+                 stderrTo=None,
+                 outputLimit=None,
+                 extract=None):
+        """command is either a string run by bash or a list of arguments
+           executed directly. With directExec None, commands without shell
+           syntax are executed directly too, which saves starting bash.
+           directExec False always uses bash, True never (the command is
+           only split into words).
+
+           The resource usage of the command (and the children it waited
+           for) is stored to runInfoTo, see rusageInfo. With
+           rssSampleInterval the summed resident memory of the process tree
+           is sampled every rssSampleInterval seconds, its maximum is
+           stored as sampledMaxRss.
+
+           stdoutTo and stderrTo are files the output is written to instead
+           of passing it on, compressed if the name ends with .gz. Only the
+           first outputLimit bytes of each stream are kept. extract maps
+           json pointers to regular expressions searched in each line of
+           stdout, the last match (its first group if any) is stored at the
+           pointer. Use {"pattern": regex, "stream": "stderr"} to search
+           stderr instead."""
         super().__init__()
         self.command = command
+        self.directExec = directExec
+        self.rssSampleInterval = rssSampleInterval
+        self.stdoutTo = stdoutTo
+        self.stderrTo = stderrTo
+        self.outputLimit = outputLimit
+        self.extract = extract if extract is not None else dict()
         self.limitsConfigPath = limitsConfig
         self.runInfoTo = runInfoTo
         self.requireNormalExit = requireNormalExit
@@ -516,10 +1078,77 @@ class RunShell(Tool):
             limitsConfig = None
 
         self.limits = dict()
+        self.cgroupLimits = dict()
         if limitsConfig is not None:
             for key, value in limitsConfig.items():
                 if key.startswith("RLIMIT_"):
                     self.limits[key] = value
+                elif key.startswith("CGROUP_"):
+                    self.cgroupLimits[key] = value
+
+    # %limits keys of the cgroup limits and parameters of Cgroup.setLimits
+    cgroupLimitNames = {
+        "CGROUP_MEMORY_MAX": "memoryMax",
+        "CGROUP_SWAP_MAX": "swapMax",
+        "CGROUP_PIDS_MAX": "pidsMax",
+        "CGROUP_CPUS": "cpus",
+    }
+
+    def createCgroup(self):
+        """Creates the cgroup of the command if %limits has CGROUP_ keys:
+           CGROUP_MEMORY_MAX and CGROUP_SWAP_MAX in bytes, CGROUP_PIDS_MAX
+           and CGROUP_CPUS, the (fractional) number of cpus."""
+        self.cgroup = None
+        self.joinCgroup = None
+        if len(self.cgroupLimits) == 0:
+            return
+
+        unknown = set(self.cgroupLimits) - set(self.cgroupLimitNames)
+        if len(unknown) > 0:
+            logging.warning("Invalid cgroup limits %s will be ignored."
+                            % (", ".join(sorted(unknown))))
+        self.cgroup = cgroups.manager().createJob()
+        try:
+            self.cgroup.setLimits(**{
+                parameter: self.cgroupLimits[key]
+                for key, parameter in self.cgroupLimitNames.items()
+                if key in self.cgroupLimits})
+            self.joinCgroup, self.cgroupProcs = self.cgroup.joinFunction()
+        except BaseException:
+            self.cgroup.remove()
+            self.cgroup = None
+            raise
+
+    def releaseCgroup(self):
+        """Kills what is left of the command, removes its cgroup and
+           returns the accounting of the cgroup."""
+        if self.cgroup is None:
+            return dict()
+        try:
+            stats = self.cgroup.stats()
+        finally:
+            self.cgroup.remove()
+            self.cgroup = None
+        return stats
+
+    def kill(self):
+        """Kills the command with all its children."""
+        self.timedOut = True
+        if self.cgroup is not None:
+            self.cgroup.kill()
+        else:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def abort(self):
+        """Kills the command and releases everything it uses."""
+        if self.process.returncode is None:
+            self.kill()
+            self.process.wait()
+        self.stopMonitoring()
+        self.releaseCgroup()
 
     def setLimits(self):
         for key, value in self.limits.items():
@@ -532,70 +1161,200 @@ class RunShell(Tool):
 
     def preexec_fn(self):
         self.setLimits()
+        if self.metadata.shellCpus is not None:
+            self.setCpus()
+        if self.joinCgroup is not None:
+            self.joinCgroup()
         os.setsid()
 
-    def run(self):
-        self.wrtieConfig.run()
-        self.loadLimits()
-
-        startTime = time.perf_counter()
-        startInfo = resource.getrusage(resource.RUSAGE_CHILDREN)
+    def commandLine(self):
+        """Returns the substituted command as string and the argument list
+           to execute it directly, which is None if bash is needed."""
+        if isinstance(self.command, list):
+            argv = [self.substitute(str(arg)) for arg in self.command]
+            return shlex.join(argv), argv
 
         commandString = self.substitute(self.command)
-        logging.info('RunShell: %s', commandString)
+        if self.directExec is None:
+            return commandString, directArgv(commandString)
+        elif self.directExec:
+            argv = shlex.split(commandString)
+            if len(argv) > 0 and argv[0] == "exec":
+                argv = argv[1:]
+            return commandString, argv
+        return commandString, None
+
+    def setCpus(self):
+        os.sched_setaffinity(0, self.metadata.shellCpus)
+
+    def spawn(self, commandString, argv, stdout=None, stderr=None):
+        if self.metadata.shellNode is not None:
+            # numactl sets the memory policy of the command, libnuma must
+            # not be loaded between fork and exec
+            prefix = topology.bindMemoryCommand(self.metadata.shellNode)
+            if len(prefix) > 0:
+                if argv is None:
+                    argv = ["/bin/bash", "-c", commandString]
+                argv = prefix + argv
+        if argv is not None:
+            # without preexec_fn subprocess can use vfork, the new session
+            # is created without running python code in the child
+            preexec_fn = None
+            if len(self.limits) > 0 or self.joinCgroup is not None \
+                    or self.metadata.shellCpus is not None:
+                # preexec_fn creates the session itself
+                preexec_fn = self.preexec_fn
+            return subprocess.Popen(
+                argv,
+                stdout=stdout,
+                stderr=stderr,
+                start_new_session=preexec_fn is None,
+                preexec_fn=preexec_fn)
+
         ## for some reason I prepended exec to the command string, maybe I wanted
         ## to prevent a subprocess for successfull kiling after timeout? But that is
         ## fixed now anyway. I will remove the exec as it hinders when using bash tricks
         ## like (head;tail) < file.txt
         # commandString = "exec " + commandString
-        process = subprocess.Popen(
+        return subprocess.Popen(
             commandString,
+            stdout=stdout,
+            stderr=stderr,
             shell=True,
             preexec_fn=self.preexec_fn,
             executable='/bin/bash')
 
-        try:
-            timeout = self.access(self.limitsConfigPath)["timeout"]
-        except KeyError:
-            timeout = None
+    def start(self):
+        """Starts the command, the process is stored to process."""
+        self.wrtieConfig.run()
+        self.loadLimits()
 
-        if timeout is None:
-            process.wait()
-        else:
-            try:
-                process.wait(timeout)
-            except subprocess.TimeoutExpired:
-                # process.kill()
-                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                process.wait()
+        self.startTime = time.perf_counter()
+
+        self.commandString, argv = self.commandLine()
+        logging.info('RunShell: %s', self.commandString)
+
+        self.extractors = {"stdout": list(), "stderr": list()}
+        for pointer, pattern in self.extract.items():
+            stream = "stdout"
+            if isinstance(pattern, dict):
+                stream = pattern.get("stream", stream)
+                pattern = pattern["pattern"]
+            self.extractors[stream].append(capture.Extractor(pointer, pattern))
+        outputTo = {"stdout": self.stdoutTo, "stderr": self.stderrTo}
+        pipes = {name: subprocess.PIPE
+                 if outputTo[name] is not None or len(self.extractors[name])
+                 else None for name in outputTo}
+
+        self.timedOut = False
+        self.createCgroup()
+        try:
+            self.process = self.spawn(
+                self.commandString, argv, pipes["stdout"], pipes["stderr"])
+        except BaseException:
+            self.releaseCgroup()
+            raise
+        finally:
+            if self.joinCgroup is not None:
+                os.close(self.cgroupProcs)
+
+        self.streams = dict()
+        for name, forward in (("stdout", 1), ("stderr", 2)):
+            pipe = getattr(self.process, name)
+            if pipe is not None:
+                filename = outputTo[name]
+                if filename is not None:
+                    filename = self.substitute(filename)
+                self.streams[name] = capture.CapturedStream(
+                    pipe, filename, self.outputLimit, forward,
+                    self.extractors[name])
+        self.capture = None
+        if len(self.streams) > 0:
+            self.capture = capture.OutputCapture(self.streams.values())
+            self.capture.start()
 
-        info = resource.getrusage(resource.RUSAGE_CHILDREN)
+        try:
+            self.timeout = self.access(self.limitsConfigPath)["timeout"]
+        except KeyError:
+            self.timeout = None
+
+        self.sampler = None
+        if self.rssSampleInterval is not None:
+            self.sampler = RssSampler(
+                self.process.pid, self.rssSampleInterval)
+            self.sampler.start()
+
+    def finish(self, info):
+        """Stores the results of the finished process, info is its resource
+           usage."""
+        wallClockTime = time.perf_counter() - self.startTime
+        self.stopMonitoring()
+        cgroupStats = self.releaseCgroup()
+        process = self.process
 
         self.readConfig.run()
 
+        for extractors in self.extractors.values():
+            for extractor in extractors:
+                if extractor.found:
+                    self.setValue(extractor.pointer, extractor.value)
+
         if (self.runInfoTo is not None):
             timeData = self.access(self.runInfoTo, createMissing=True)
-            timeData["userTime"] = info.ru_utime - startInfo.ru_utime
-            timeData["systemTime"] = info.ru_stime - startInfo.ru_stime
-            timeData["wallClockTime"] = time.perf_counter() - startTime
+            timeData["userTime"] = info.ru_utime
+            timeData["systemTime"] = info.ru_stime
+            timeData["wallClockTime"] = wallClockTime
             timeData["returnCode"] = process.returncode
+            timeData["timedOut"] = self.timedOut
+            timeData.update(rusageInfo(info))
+            timeData.update(cgroupStats)
+            if self.sampler is not None:
+                timeData["sampledMaxRss"] = self.sampler.maxRss
+            for name, stream in self.streams.items():
+                if stream.file is not None:
+                    timeData[name + "Size"] = stream.size
+                    timeData[name + "Truncated"] = stream.truncated
 
         if (self.requireNormalExit and process.returncode != 0):
             raise NonZeroExitCodeException(
-                'During execution of ' + commandString)
+                'During execution of ' + self.commandString)
+
+    def run(self):
+        self.start()
+        if self.metadata.shellExecutor is not None:
+            # the executor waits for the process and calls finish
+            raise framework.SuspendPipeline(self)
+
+        try:
+            info = waitProcess(self.process, self.timeout, self.kill)
+        except BaseException:
+            self.abort()
+            raise
+        self.finish(info)
+
+    def stopMonitoring(self):
+        """Stops the rss sampling and output capture threads."""
+        if self.sampler is not None:
+            self.sampler.stop()
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
 
 
 class RunJava(RunShell):
     def __init__(self, command, runInfoTo=None,
                  limitsConfig=json_names.limitsConfig.text,
                  externalUsedConfig=None,
-                 requireNormalExit=False):
+                 requireNormalExit=False,
+                 **options):
+        """options are the further keyword arguments of RunShell."""
         command = "exec java -jar " + command
         super().__init__(
             command, runInfoTo,
             limitsConfig,
             externalUsedConfig,
-            requireNormalExit)
+            requireNormalExit,
+            **options)
 
     def loadLimits(self):
         super().loadLimits()
@@ -0,0 +1,206 @@
+"""CPU topology of linux machines for placing jobs. The topology is read
+from sysfs, one logical CPU per physical core is used so SMT siblings do
+not distort time measurements."""
+import os
+import glob
+import shutil
+import ctypes
+import ctypes.util
+import logging
+import functools
+
+from collections import namedtuple
+
+sysfsRoot = "/sys/devices/system"
+
+# a logical cpu, core is the lowest cpu of its SMT siblings, l3 the lowest
+# cpu sharing its last level cache
+Cpu = namedtuple("Cpu", ["cpu", "core", "package", "node", "l3"])
+
+
+def parseCpuList(text):
+    """Parses a cpu list like "0-3,8,10-11" into a list of ints."""
+    cpus = list()
+    for part in text.strip().split(","):
+        if part == "":
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def _readFirstCpu(path, default):
+    try:
+        with open(path) as file:
+            cpus = parseCpuList(file.read())
+    except (OSError, ValueError):
+        return default
+    return min(cpus) if len(cpus) > 0 else default
+
+
+def _readInt(path, default):
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except (OSError, ValueError):
+        return default
+
+
+def readTopology(root=sysfsRoot, allowed=None):
+    """Returns the Cpu of every logical cpu this process may run on (or
+       of allowed)."""
+    if allowed is None:
+        allowed = os.sched_getaffinity(0)
+
+    nodes = dict()
+    for nodeDir in glob.glob(os.path.join(root, "node", "node[0-9]*")):
+        node = int(os.path.basename(nodeDir)[4:])
+        try:
+            with open(os.path.join(nodeDir, "cpulist")) as file:
+                for cpu in parseCpuList(file.read()):
+                    nodes[cpu] = node
+        except OSError:
+            continue
+
+    cpus = list()
+    for cpu in sorted(allowed):
+        cpuDir = os.path.join(root, "cpu", "cpu%d" % (cpu))
+        topologyDir = os.path.join(cpuDir, "topology")
+        core = _readFirstCpu(
+            os.path.join(topologyDir, "thread_siblings_list"), cpu)
+        package = _readInt(
+            os.path.join(topologyDir, "physical_package_id"), 0)
+        l3 = package
+        for cacheDir in glob.glob(os.path.join(cpuDir, "cache", "index*")):
+            if _readInt(os.path.join(cacheDir, "level"), 0) == 3:
+                l3 = _readFirstCpu(
+                    os.path.join(cacheDir, "shared_cpu_list"), package)
+        cpus.append(Cpu(cpu, core, package, nodes.get(cpu, 0), l3))
+    return cpus
+
+
+def _groupBy(items, key):
+    """Splits the sorted items into lists of equal key."""
+    groups = list()
+    for item in items:
+        if len(groups) == 0 or key(groups[-1][0]) != key(item):
+            groups.append(list())
+        groups[-1].append(item)
+    return groups
+
+
+def _interleave(groups):
+    """Takes one item of each group in turn."""
+    groups = [list(group) for group in groups]
+    items = list()
+    while any(len(group) > 0 for group in groups):
+        for group in groups:
+            if len(group) > 0:
+                items.append(group.pop(0))
+    return items
+
+
+def selectCpus(count=None, policy="spread", topology=None):
+    """Selects count cpus (by default all physical cores), one logical cpu
+       per physical core. With policy "spread" the cpus are distributed
+       round robin over the NUMA nodes and their last level caches, with
+       "pack" the nodes and caches are filled one after the other. If
+       count is larger than the number of cores SMT siblings are used."""
+    if policy not in ("spread", "pack"):
+        raise ValueError("Unknown placement policy %s, use spread or pack."
+                         % (policy))
+    if topology is None:
+        topology = readTopology()
+
+    cores = [cpu for cpu in topology if cpu.cpu == cpu.core]
+    siblings = [cpu for cpu in topology if cpu.cpu != cpu.core]
+    if count is None:
+        count = len(cores)
+
+    selected = list()
+    for candidates in (cores, siblings):
+        candidates = sorted(
+            candidates, key=lambda cpu: (cpu.node, cpu.l3, cpu.cpu))
+        if policy == "spread":
+            candidates = _interleave(
+                _interleave(_groupBy(cpus, lambda cpu: cpu.l3))
+                for cpus in _groupBy(candidates, lambda cpu: cpu.node))
+        selected.extend(candidates[:count - len(selected)])
+
+    if len(selected) < count:
+        logging.warning("Only %d cpus available, %d requested."
+                        % (len(selected), count))
+    return selected
+
+
+_libnuma = None
+
+
+def _loadLibnuma():
+    """Returns libnuma or None if it is not installed or the system does
+       not support NUMA."""
+    global _libnuma
+    if _libnuma is None:
+        _libnuma = False
+        name = ctypes.util.find_library("numa")
+        if name is not None:
+            try:
+                library = ctypes.CDLL(name)
+                if library.numa_available() >= 0:
+                    library.numa_parse_nodestring.restype = ctypes.c_void_p
+                    _libnuma = library
+            except OSError as e:
+                logging.debug("Can not load libnuma: %s" % (e))
+    return _libnuma or None
+
+
+def bindMemory(node, strict=False):
+    """Makes this process allocate its memory on the NUMA node, children
+       inherit the policy. Unless strict, other nodes are used when node
+       has no free memory. Uses libnuma, returns False if it is not
+       available. Call it in the process itself, not between fork and
+       exec (preexec_fn) of a child, loading libraries is not safe there,
+       see bindMemoryCommand."""
+    libnuma = _loadLibnuma()
+    if libnuma is None:
+        logging.debug("libnuma is not available, memory is not bound.")
+        return False
+
+    if not strict:
+        libnuma.numa_set_preferred(ctypes.c_int(node))
+        return True
+    nodes = libnuma.numa_parse_nodestring(str(node).encode())
+    if not nodes:
+        logging.warning("Could not bind memory to node %d." % (node))
+        return False
+    libnuma.numa_set_membind(ctypes.c_void_p(nodes))
+    libnuma.numa_bitmask_free(ctypes.c_void_p(nodes))
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def _numactl():
+    return shutil.which("numactl")
+
+
+def bindMemoryCommand(node, strict=False):
+    """Returns the arguments to prepend to a command, so its memory is
+       allocated on the NUMA node like with bindMemory. The list is empty
+       if numactl is not installed."""
+    numactl = _numactl()
+    if numactl is None:
+        logging.debug("numactl is not installed, memory is not bound.")
+        return list()
+    return [numactl, ("--membind=%d" if strict else "--preferred=%d")
+            % (node), "--"]
+
+
+def place(cpu, strict=False):
+    """Pins this process to the Cpu cpu and its memory to the node of cpu.
+       Returns the placement as dict for recording it."""
+    os.sched_setaffinity(0, {cpu.cpu})
+    bindMemory(cpu.node, strict)
+    return cpu._asdict()
@@ -0,0 +1,93 @@
+import os
+import gzip
+import tempfile
+import unittest
+
+from .context import experimentrun
+from experimentrun import capture
+
+
+class CapturedStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def capture(self, chunks, **kwargs):
+        reader, writer = os.pipe()
+        os.close(writer)
+        stream = capture.CapturedStream(
+            os.fdopen(reader, 'rb'), **kwargs)
+        for chunk in chunks:
+            stream.write(chunk)
+        stream.close()
+        return stream
+
+    def test_output_is_cut_at_limit(self):
+        filename = os.path.join(self.directory.name, "out.txt")
+        stream = self.capture([b"a" * 6, b"b" * 6], filename=filename,
+                              limit=8)
+
+        with open(filename, 'rb') as output:
+            self.assertEqual(output.read(), b"a" * 6 + b"b" * 2)
+        self.assertEqual(stream.size, 12)
+        self.assertTrue(stream.truncated)
+
+    def test_output_within_limit_is_complete(self):
+        filename = os.path.join(self.directory.name, "out.txt.gz")
+        stream = self.capture([b"line\n"], filename=filename, limit=5)
+
+        with gzip.open(filename, 'rb') as output:
+            self.assertEqual(output.read(), b"line\n")
+        self.assertFalse(stream.truncated)
+
+    def test_extractors_keep_last_match(self):
+        time = capture.Extractor("/time", r"time: (\S+)")
+        status = capture.Extractor("/status", r"SAT|UNSAT")
+        missing = capture.Extractor("/missing", r"never")
+        # lines split across writes and a last line without newline
+        self.capture([b"time: 1\nti", b"me: 2.5\nUNSAT\ntime: x"],
+                     extractors=[time, status, missing])
+
+        self.assertEqual(time.value, "x")
+        self.assertEqual(status.value, "UNSAT")
+        self.assertTrue(status.found)
+        self.assertFalse(missing.found)
+
+    def test_extracted_numbers_are_converted(self):
+        time = capture.Extractor("/time", r"time: (\S+)")
+        self.capture([b"time: 1\n"], extractors=[time])
+        self.assertEqual(time.value, 1)
+        self.capture([b"time: 2.5\n"], extractors=[time])
+        self.assertEqual(time.value, 2.5)
+
+    def test_extractors_see_output_beyond_limit(self):
+        filename = os.path.join(self.directory.name, "out.txt")
+        time = capture.Extractor("/time", r"time: (\d+)")
+        self.capture([b"x" * 100 + b"\n", b"time: 3\n"], filename=filename,
+                     limit=10, extractors=[time])
+        self.assertEqual(time.value, 3)
+
+
+class OutputCaptureTest(unittest.TestCase):
+    def test_reads_until_pipe_is_closed(self):
+        reader, writer = os.pipe()
+        lines = capture.Extractor("/n", r"(\d+)")
+        stream = capture.CapturedStream(
+            os.fdopen(reader, 'rb'), extractors=[lines])
+        output = capture.OutputCapture([stream])
+        output.start()
+        # more than fits into a pipe buffer
+        for i in range(20000):
+            os.write(writer, b"%d\n" % (i))
+        os.close(writer)
+        output.close()
+
+        self.assertEqual(lines.value, 19999)
+        self.assertEqual(stream.size, sum(len(b"%d\n" % (i))
+                                          for i in range(20000)))
+
+
+if __name__ == '__main__':
+    unittest.main()
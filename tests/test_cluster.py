@@ -0,0 +1,200 @@
+import os
+import unittest
+
+from unittest import mock
+
+from .context import experimentrun
+from experimentrun import cluster
+
+
+class FakeFuture(object):
+    """Result of an asynchronous call, resolved by the test."""
+    def then(self, call, *args):
+        self.call = call
+        self.args = args
+        return self
+
+    def iferror(self, handler):
+        self.handler = handler
+        return self
+
+
+class FakeProxy(object):
+    """A JobDispatcher whose batches finish when the test says so. The
+       outcome of each job is handle(method, args)."""
+    def __init__(self, handle):
+        self.handle = handle
+        self.batches = list()
+        self.broken = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def _pyroAsync(self):
+        pass
+
+    def ping(self):
+        if self.broken:
+            raise ConnectionError("unreachable")
+        return True
+
+    def setIncludes(self, includes):
+        pass
+
+    def runBatch(self, requests):
+        future = FakeFuture()
+        self.batches.append((requests, future))
+        return future
+
+    def complete(self):
+        """Finishes the oldest batch."""
+        requests, future = self.batches.pop(0)
+        future.call([self.handle(method, args) for method, args in requests],
+                    *future.args)
+
+    def fail(self):
+        """Fails the call of the oldest batch."""
+        requests, future = self.batches.pop(0)
+        future.handler(ConnectionError("connection lost"))
+
+
+def ok(method, args):
+    return ["ok", args[0] if method == "run" else args[2], 0.01]
+
+
+class ClusterTest(unittest.TestCase):
+    def setUp(self):
+        self.results = list()
+        self.proxy = FakeProxy(ok)
+        ns = mock.Mock()
+        ns.list.return_value = {"node-0.jobdispatcher": "PYRO:node-0@n:1"}
+        for patcher in (
+                mock.patch.object(cluster.Pyro4, "locateNS", return_value=ns),
+                mock.patch.object(cluster.Pyro4, "Proxy",
+                                  lambda uri: self.proxy)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def dispatcher(self, **kwargs):
+        dispatcher = cluster.ClusterDispatcher(
+            self.results, discoveryInterval=3600, **kwargs)
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    def sent(self):
+        """The requests of the batches sent and not finished."""
+        return [requests for requests, future in self.proxy.batches]
+
+    def runAll(self, dispatcher):
+        while len(self.proxy.batches) > 0:
+            self.proxy.complete()
+        dispatcher.wait()
+
+
+class BatchingTest(ClusterTest):
+    def test_batches_grow_with_known_duration(self):
+        dispatcher = self.dispatcher(batchTime=0.5, prefetch=1)
+        for i in range(10):
+            dispatcher.run(i, os.getcwd())
+        # one running and one prefetched batch, one job each until a
+        # duration is known
+        self.assertEqual([len(batch) for batch in self.sent()], [1, 1])
+
+        self.proxy.complete()
+        self.assertEqual([len(batch) for batch in self.sent()], [1, 8])
+        self.runAll(dispatcher)
+        self.assertEqual(sorted(self.results), list(range(10)))
+
+    def test_batch_size_is_bounded(self):
+        dispatcher = self.dispatcher(batchTime=10, maxBatch=4, prefetch=0)
+        # submit blocks beyond 2 * maxBatch waiting jobs
+        for i in range(8):
+            dispatcher.run(i, os.getcwd())
+        self.proxy.complete()
+        self.assertEqual([len(batch) for batch in self.sent()], [4])
+        self.runAll(dispatcher)
+        self.assertEqual(sorted(self.results), list(range(8)))
+
+    def test_template_is_sent_until_confirmed(self):
+        dispatcher = self.dispatcher(prefetch=1)
+        for i in range(3):
+            dispatcher.runIndexed(0, {"v": 1}, i, os.getcwd(), None)
+        templates = [args[1] for batch in self.sent()
+                     for method, args in batch]
+        self.assertEqual(templates, [{"v": 1}, {"v": 1}])
+
+        self.proxy.complete()
+        templates = [args[1] for batch in self.sent()
+                     for method, args in batch]
+        self.assertEqual(templates, [{"v": 1}, None])
+        self.runAll(dispatcher)
+        self.assertEqual(sorted(self.results), [0, 1, 2])
+
+
+class RetryTest(ClusterTest):
+    def test_failed_job_is_retried(self):
+        outcomes = [["error", "ValueError: once", 0.01]]
+        self.proxy.handle = lambda method, args: \
+            outcomes.pop() if len(outcomes) > 0 else ok(method, args)
+        dispatcher = self.dispatcher(maxAttempts=2)
+        dispatcher.run(0, os.getcwd())
+        self.runAll(dispatcher)
+        self.assertEqual(self.results, [0])
+
+    def test_job_fails_after_max_attempts(self):
+        self.proxy.handle = lambda method, args: \
+            ["error", "ValueError: always", 0.01]
+        dispatcher = self.dispatcher(maxAttempts=2)
+        dispatcher.run(0, os.getcwd())
+        self.proxy.complete()
+        self.proxy.complete()
+        self.assertEqual(self.sent(), [])
+
+        with self.assertRaisesRegex(RuntimeError, "always"):
+            dispatcher.wait()
+        self.assertEqual(self.results, [])
+
+    def test_unknown_template_is_uploaded_again(self):
+        outcomes = [["unknownTemplate", "Unknown template.", 0.0]]
+        self.proxy.handle = lambda method, args: \
+            outcomes.pop() if len(outcomes) > 0 else ok(method, args)
+        # a rejected template does not count as attempt
+        dispatcher = self.dispatcher(maxAttempts=1)
+        dispatcher.runIndexed(0, {"v": 1}, 0, os.getcwd(), None)
+        self.proxy.complete()
+
+        [[method, args]] = self.sent()[0]
+        self.assertEqual(args[1], {"v": 1})
+        self.runAll(dispatcher)
+        self.assertEqual(self.results, [0])
+
+    def test_failed_dispatcher_is_dropped(self):
+        dispatcher = self.dispatcher(capacityTimeout=0.01)
+        dispatcher.run(0, os.getcwd())
+        self.proxy.broken = True
+        self.proxy.fail()
+
+        self.assertEqual(len(dispatcher.aviableDispatchers), 0)
+        self.assertEqual(len(dispatcher.pending), 1)
+        with self.assertRaisesRegex(RuntimeError, "No job dispatcher"):
+            dispatcher.wait()
+
+    def test_jobs_move_to_rediscovered_dispatcher(self):
+        dispatcher = self.dispatcher()
+        dispatcher.run(0, os.getcwd())
+        self.proxy.broken = True
+        self.proxy.fail()
+        self.assertEqual(self.sent(), [])
+
+        self.proxy.broken = False
+        dispatcher.discover()
+        dispatcher.schedule()
+        self.runAll(dispatcher)
+        self.assertEqual(self.results, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
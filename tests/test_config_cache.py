@@ -0,0 +1,85 @@
+import os
+import json
+import tempfile
+import unittest
+
+from unittest import mock
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import config_cache
+
+
+class ConfigCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = self.path("config.json")
+        self.linked = self.path("linked.json")
+        self.write(self.linked, {"value": 1})
+        self.write(self.config, {
+            "tools": [],
+            "linked": {"%linkFile": "${/EXRUN_CONF_DIR}/linked.json"}})
+        self.cache = config_cache.ConfigCache(self.path("cache"))
+        self.parsed = list()
+        self.parse = framework.parseCommentedJson
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write(self, path, data, mtime=None):
+        with open(path, 'w') as jsonFile:
+            json.dump(data, jsonFile)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def load(self):
+        """Loads the config with a fresh json cache, like a new process."""
+        def parse(data, jsonPath="<json>"):
+            self.parsed.append(os.path.basename(jsonPath))
+            return self.parse(data, jsonPath)
+        with mock.patch.object(framework, "parseCommentedJson", parse), \
+                mock.patch.object(framework, "_jsonCache", type(
+                    framework._jsonCache)()), \
+                mock.patch.object(framework, "_jsonCacheBytes", 0):
+            config = self.cache.load(self.config)
+            return config, framework.loadJsonCached(self.linked)
+
+    def test_hit_skips_parsing(self):
+        first = self.load()
+        del self.parsed[:]
+        second = self.load()
+
+        self.assertEqual(first, second)
+        self.assertEqual(second[1], {"value": 1})
+        self.assertEqual(self.parsed, [])
+
+    def test_changed_linked_file_invalidates_entry(self):
+        self.load()
+        version = framework.fileVersion(self.linked)
+        # same size, so only the modification time tells the change
+        self.write(self.linked, {"value": 2}, mtime=version[0] + 10 ** 9)
+        del self.parsed[:]
+
+        config, linked = self.load()
+        self.assertEqual(linked, {"value": 2})
+        self.assertIn("config.json", self.parsed)
+
+        del self.parsed[:]
+        self.assertEqual(self.load()[1], {"value": 2})
+        self.assertEqual(self.parsed, [])
+
+    def test_touched_linked_file_keeps_entry(self):
+        self.load()
+        version = framework.fileVersion(self.linked)
+        os.utime(self.linked, ns=(version[0] + 10 ** 9,) * 2)
+        del self.parsed[:]
+
+        self.assertEqual(self.load()[1], {"value": 1})
+        self.assertNotIn("config.json", self.parsed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import time
+import signal
+import tempfile
+import unittest
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import json_names
+from experimentrun import tools
+
+
+seen = list()
+
+
+def record(context, name):
+    seen.append((context.config["v"], name))
+
+
+def runTools(context, *tools):
+    # a tool running a list of tools that is not part of config["tools"]
+    context.metadata.runConstructorList(list(tools))
+
+
+def runAsync(configurations, directory, processors=[0, 0, 0]):
+    config = {
+        "configurations": configurations,
+        json_names.exrunConfDir.text: directory}
+    metadata = framework.Metadata(config)
+    tool = tools.ExplodeNBootstrap(asyncShell=True, processors=processors)
+    tool.setup(metadata)
+    tool.run()
+    return metadata.config["runResults"]
+
+
+class ShellExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_external_used_config_runs_command_once(self):
+        # mkdir fails if the command runs a second time for a value, one
+        # slot as the configurations share the file of the used config
+        command = "mkdir %s/run-${/v}" % (self.directory.name)
+        results = runAsync([{
+            "v": {"%explode": list(range(4))},
+            "tools": [
+                "experimentrun.tools.RunShell{'command': '%s', "
+                "'runInfoTo': '/info', 'requireNormalExit': True, "
+                "'externalUsedConfig': '%s/config.json'}"
+                % (command, self.directory.name),
+                "experimentrun.tools.Eval()"]}],
+            self.directory.name, processors=[0])
+
+        self.assertEqual(sorted(result["v"] for result in results),
+                         list(range(4)))
+        for result in results:
+            self.assertEqual(result["info"]["returnCode"], 0)
+            # the config read back keeps the tools written before the
+            # command, as without the executor the suspended list is
+            # resumed
+            self.assertEqual(result["tools"], ["experimentrun.tools.Eval()"])
+        self.assertEqual(len(os.listdir(self.directory.name)), 5)
+
+    def test_nested_tool_lists_resume_after_command(self):
+        del seen[:]
+        shell = "experimentrun.tools.RunShell{'command': 'true'}"
+        runAsync([{
+            "v": {"%explode": list(range(3))},
+            "tools": [
+                ["tests.test_executor.record('a')", shell,
+                 "tests.test_executor.record('b')"],
+                "tests.test_executor.runTools(%s, %s)" % (
+                    repr(shell), repr("tests.test_executor.record('c')")),
+                "tests.test_executor.record('d')"]}],
+            self.directory.name)
+
+        for v in range(3):
+            self.assertEqual([name for value, name in seen if value == v],
+                             ["a", "b", "c", "d"])
+
+    def test_many_configurations_without_commands(self):
+        results = runAsync([{
+            "v": {"%explode": list(range(3000))},
+            "tools": ["experimentrun.tools.Eval()"]}],
+            self.directory.name)
+
+        self.assertEqual(len(results), 3000)
+
+    def test_timeout_kills_command_with_rlimits(self):
+        # unpinned, so the command is started without bash and without
+        # cpu binding
+        start = time.monotonic()
+        results = runAsync([{
+            "%limits": {"timeout": 0.5, "RLIMIT_CPU": [60, 60]},
+            "tools": [
+                "experimentrun.tools.RunShell{'command': 'sleep 30', "
+                "'runInfoTo': '/info'}"]}],
+            self.directory.name, processors=None)
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(results[0]["info"]["returnCode"], -signal.SIGKILL)
+
+    def test_output_of_background_children_does_not_block(self):
+        # the background sleep keeps the captured stdout of the first
+        # command open, the second command finishes while it is closed
+        del seen[:]
+        command = "if [ ${/v} = 0 ]; then sleep 3 & echo a; " \
+            "else sleep 0.3; fi"
+        runAsync([{
+            "v": {"%explode": [0, 1]},
+            "tools": [
+                "experimentrun.tools.RunShell{'command': '%s', "
+                "'stdoutTo': '%s/out-${/v}'}" % (command, self.directory.name),
+                "tests.test_executor.record('done')"]}],
+            self.directory.name, processors=[0, 0])
+
+        self.assertEqual(seen, [(1, "done"), (0, "done")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import json
+import random
+import unittest
+
+from copy import copy
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import tools
+
+explode = "%explode"
+
+
+def referenceExplode(config):
+    """The original recursive explosion, the exploded configurations are
+       compared with it."""
+    def createCopies(subEntries, config):
+        result = [config]
+        for key, valueList in subEntries:
+            exploded = list()
+            for value in valueList:
+                for config in result:
+                    cop = copy(config)
+                    cop[key] = value
+                    exploded.append(cop)
+            result = exploded
+        return result
+
+    def explodeEntry(config):
+        subEntries = list()
+        if isinstance(config, dict):
+            for key, value in config.items():
+                if key == explode:
+                    variants = list()
+                    for entry in value:
+                        exploded, sub = explodeEntry(entry)
+                        if exploded:
+                            variants.extend(sub)
+                        else:
+                            variants.append(sub)
+                    return (True, variants)
+                exploded, sub = explodeEntry(value)
+                if exploded:
+                    subEntries.append((key, sub))
+        elif isinstance(config, list):
+            for idx, value in enumerate(config):
+                exploded, sub = explodeEntry(value)
+                if exploded:
+                    subEntries.append((idx, sub))
+
+        if len(subEntries) == 0:
+            return (False, config)
+        return (True, createCopies(subEntries, config))
+
+    exploded, configs = explodeEntry(config)
+    return configs if exploded else [config]
+
+
+def randomConfig(rng, depth=0):
+    r = rng.random()
+    if depth > 3 or r < 0.3:
+        return rng.randint(0, 9)
+    if r < 0.5:
+        return {explode: [randomConfig(rng, depth + 1)
+                          for i in range(rng.randint(1, 3))]}
+    if r < 0.75:
+        return {str(i): randomConfig(rng, depth + 1)
+                for i in range(rng.randint(0, 3))}
+    return [randomConfig(rng, depth + 1) for i in range(rng.randint(0, 3))]
+
+
+class ExplosionTest(unittest.TestCase):
+    def test_explode_matches_reference(self):
+        for seed in range(2000):
+            config = randomConfig(random.Random(seed))
+            expected = json.dumps(referenceExplode(config))
+            self.assertEqual(
+                json.dumps(framework.explodeConfig(config)), expected,
+                "seed %d" % (seed))
+
+    def test_plan_random_access_matches_reference(self):
+        for seed in range(1000):
+            config = randomConfig(random.Random(seed))
+            expected = referenceExplode(config)
+            plan = framework.ExplosionPlan(config)
+            self.assertEqual(len(plan), len(expected), "seed %d" % (seed))
+            self.assertEqual(
+                json.dumps([plan[i] for i in range(len(plan))]),
+                json.dumps(expected), "seed %d" % (seed))
+
+    def test_exploded_configurations_are_independent(self):
+        config = {"a": {explode: [[1], [2]]}, "b": {"c": [3]}}
+        first, second = framework.explodeConfig(config)
+        first["b"]["c"].append(4)
+        self.assertEqual(second["b"]["c"], [3])
+        self.assertEqual(config["b"]["c"], [3])
+
+
+class SubstituteTest(unittest.TestCase):
+    pieces = ["a", " ", "/", "-", ".", ":", "x_y",
+              "${/a}", "${/b/0}", "${/b/1/c}", "${/s}",
+              "%{1+2}", "%{'q' * 2}", "%{len('abc')}", "{", "}", "$", "%"]
+
+    def test_substitute_matches_reference(self):
+        tool = tools.Tool()
+        tool.setup(framework.Metadata(
+            {"a": 1, "b": [2, {"c": "three"}], "s": "text"}))
+        for seed in range(3000):
+            rng = random.Random(seed)
+            text = "".join(rng.choice(self.pieces)
+                           for i in range(rng.randint(0, 8)))
+            try:
+                expected = tool.substituteSlow(text)
+            except Exception as e:
+                with self.assertRaises(type(e), msg=text):
+                    tool.substitute(text)
+                continue
+            self.assertEqual(tool.substitute(text), expected, text)
+
+
+class ShardTest(unittest.TestCase):
+    def results(self, shard):
+        config = {
+            "configurations": [
+                {"v": {explode: list(range(7))}},
+                {"w": {explode: list(range(5))}, "x": {explode: [1, 2]}},
+                {"y": 1}],
+            framework.json_names.exrunConfDir.text: os.getcwd()}
+        tool = tools.ExplodeNBootstrap(shard=shard)
+        tool.setup(framework.Metadata(config))
+        tool.run()
+        return [json.dumps(result, sort_keys=True)
+                for result in config["runResults"]]
+
+    def test_shards_are_disjoint_and_complete(self):
+        total = 7 + 10 + 1
+        expected = self.results(None)
+        self.assertEqual(len(set(expected)), total)
+        for numShards in range(1, total + 3):
+            results = list()
+            for k in range(1, numShards + 1):
+                shardResults = self.results("%d/%d" % (k, numShards))
+                self.assertLessEqual(
+                    len(shardResults), -(-total // numShards))
+                results.extend(shardResults)
+            self.assertEqual(sorted(results), sorted(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import json
+import tempfile
+import unittest
+
+from copy import deepcopy
+
+from .context import experimentrun
+from experimentrun import framework
+
+
+seenTools = list()
+
+
+def recordTools(context):
+    seenTools.append(deepcopy(context.config["tools"]))
+
+
+class RunConstructorListTest(unittest.TestCase):
+    def setUp(self):
+        del seenTools[:]
+
+    def test_tools_are_removed_before_they_run(self):
+        config = {"tools": [
+            "tests.test_framework.recordTools()",
+            ["tests.test_framework.recordTools()",
+             "tests.test_framework.recordTools()"],
+            "tests.test_framework.recordTools()"]}
+        framework.bootstrap(config, os.getcwd())
+
+        self.assertEqual(seenTools, [
+            [["tests.test_framework.recordTools()",
+              "tests.test_framework.recordTools()"],
+             "tests.test_framework.recordTools()"],
+            ["tests.test_framework.recordTools()"],
+            ["tests.test_framework.recordTools()"],
+            []])
+        self.assertEqual(config["tools"], [])
+
+    def test_written_config_holds_remaining_tools(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "config.json")
+            config = {"tools": [
+                "experimentrun.tools.WriteConfigToFile('%s')" % (filename),
+                "experimentrun.tools.Eval()"]}
+            framework.bootstrap(config, directory)
+            with open(filename) as file:
+                written = json.load(file)
+
+        self.assertEqual(written["tools"], ["experimentrun.tools.Eval()"])
+
+
+class ParseCommentedJsonTest(unittest.TestCase):
+    def parse(self, text):
+        return framework.parseCommentedJson(text.encode("utf-8"))
+
+    def test_comments_and_trailing_commas(self):
+        self.assertEqual(
+            self.parse('{\n// comment\n"a": [1, 2, // two\n],\n"b": 3, }'),
+            {"a": [1, 2], "b": 3})
+
+    def test_comments_inside_strings(self):
+        self.assertEqual(
+            self.parse('{"url": "http://example.org", // c\n"b": "//",}'),
+            {"url": "http://example.org", "b": "//"})
+
+    def test_comma_before_commented_brace(self):
+        self.assertEqual(
+            self.parse('{"a": 1,\n// },\n"b": 2}'), {"a": 1, "b": 2})
+
+    def test_escaped_quotes(self):
+        self.assertEqual(
+            self.parse('{"a": "say \\"hi\\" // no comment,]", // c\n'
+                       '"b": "\\\\", "c": "x",}'),
+            {"a": 'say "hi" // no comment,]', "b": "\\", "c": "x"})
+
+    def test_commas_inside_strings(self):
+        self.assertEqual(
+            self.parse('{"x": "a,]",\n// c\n "y": "a, }", "z": ",}",}'),
+            {"x": "a,]", "y": "a, }", "z": ",}"})
+
+
+if __name__ == '__main__':
+    unittest.main()
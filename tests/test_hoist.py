@@ -0,0 +1,33 @@
+import signal
+import unittest
+
+from .context import experimentrun
+from experimentrun import hoist
+
+
+class InvariantHoisterTest(unittest.TestCase):
+    def hoist(self, expression):
+        template = {
+            "tools": ["experimentrun.tools.Eval()"],
+            "v": {"%explode": [1, 2]},
+            "value": {"%eval": expression}}
+        hoist.InvariantHoister(template, "/").run()
+        return template["value"]
+
+    def test_invariant_expression_is_hoisted(self):
+        self.assertEqual(self.hoist("2 ** 10"), 1024)
+
+    def test_calls_are_not_hoisted(self):
+        self.assertEqual(self.hoist("random.random()"),
+                         {"%eval": "random.random()"})
+
+    def test_failing_expression_is_not_hoisted(self):
+        self.assertEqual(self.hoist("1 / 0"), {"%eval": "1 / 0"})
+
+    def test_expression_sees_globals_of_eval(self):
+        # Eval runs the expressions with the globals of experimentrun.tools
+        self.assertEqual(self.hoist("signal.SIGKILL"), signal.SIGKILL)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import results
+from experimentrun import tools
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "cache.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def stored(self):
+        """The hashes written to the file, read by another connection."""
+        connection = sqlite3.connect(self.filename)
+        try:
+            return {row[0] for row in connection.execute(
+                "SELECT hash FROM resultCache")}
+        finally:
+            connection.close()
+
+    def test_put_is_buffered_until_flush(self):
+        cache = results.ResultCache(self.filename, bufferSize=16)
+        cache.put(b"a", {"v": 1})
+
+        self.assertEqual(cache.get(b"a"), {"v": 1})
+        self.assertIsNone(cache.get(b"b"))
+        self.assertEqual(self.stored(), set())
+        cache.flush()
+        self.assertEqual(self.stored(), {b"a"})
+        cache.close()
+
+    def test_full_buffer_is_written(self):
+        cache = results.ResultCache(self.filename, bufferSize=2)
+        cache.put(b"a", {"v": 1})
+        cache.put(b"b", {"v": 2})
+
+        self.assertEqual(self.stored(), {b"a", b"b"})
+        cache.close()
+
+    def test_results_survive_close(self):
+        cache = results.ResultCache(self.filename)
+        cache.put(b"a", {"v": [1, "x"]})
+        cache.close()
+
+        cache = results.ResultCache(self.filename)
+        self.assertEqual(cache.get(b"a"), {"v": [1, "x"]})
+        cache.close()
+
+    def test_journal_sync_flushes_cache(self):
+        tool = tools.ExplodeNBootstrap()
+        tool.sink = results.MemorySink()
+        tool.cache = results.ResultCache(self.filename)
+        tool.cache.put(b"a", {"v": 1})
+
+        tool.syncResults()
+        self.assertEqual(self.stored(), {b"a"})
+        tool.cache.close()
+
+
+class ConfigHashTest(unittest.TestCase):
+    def test_hash_ignores_key_order(self):
+        self.assertEqual(framework.configHash({"a": 1, "b": [1, {"c": 2}]}),
+                         framework.configHash({"b": [1, {"c": 2}], "a": 1}))
+
+    def test_hash_depends_on_values(self):
+        self.assertNotEqual(framework.configHash({"a": 1}),
+                            framework.configHash({"a": 2}))
+        self.assertNotEqual(framework.configHash({"a": [1, 2]}),
+                            framework.configHash({"a": [2, 1]}))
+
+    def test_hash_is_stable(self):
+        # hashes are stored in result caches and journals, they must not
+        # change between versions
+        self.assertEqual(framework.configHash({"b": 2, "a": [1, "x"]}).hex(),
+                         "8c3a091835bde2ffe2ec3812bde153bb32e4ce65")
+
+
+if __name__ == '__main__':
+    unittest.main()
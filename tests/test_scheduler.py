@@ -0,0 +1,107 @@
+import unittest
+
+from collections import deque
+
+from .context import experimentrun
+from experimentrun import scheduler
+
+
+class FakePool(object):
+    """Records started jobs, they finish when the test says so or right
+       away if immediate."""
+    def __init__(self, immediate=False):
+        self.started = list()
+        self.running = dict()
+        self.immediate = immediate
+
+    def apply_async(self, func, args, callback, error_callback):
+        name = args[0]
+        self.started.append(name)
+        self.running[name] = (func, args, callback, error_callback)
+        if self.immediate:
+            self.finish(name)
+
+    def finish(self, name):
+        func, args, callback, error_callback = self.running.pop(name)
+        try:
+            result = func(*args)
+        except Exception as e:
+            error_callback(e)
+        else:
+            callback(result)
+
+
+class AdmissionSchedulerTest(unittest.TestCase):
+    def scheduler(self, budget, func=lambda name: name, immediate=False,
+                  **kwargs):
+        self.pool = FakePool(immediate)
+        return scheduler.AdmissionScheduler(
+            self.pool, func, 4, budget, **kwargs)
+
+    def pending(self, *jobs):
+        return deque(scheduler._PendingJob((name,), memory)
+                     for name, memory in jobs)
+
+    def test_smaller_jobs_backfill(self):
+        admission = self.scheduler(10)
+        pending = self.pending(("a", 6), ("b", 6), ("c", 3), ("d", 2))
+        admission.admit(pending)
+
+        self.assertEqual(self.pool.started, ["a", "c"])
+        self.assertEqual(admission.usedMemory, 9)
+        self.assertEqual([job.args[0] for job in pending], ["b", "d"])
+        self.assertEqual(pending[0].bypassed, 1)
+        self.assertEqual(admission.numBackfilled, 1)
+
+    def test_bypassed_job_reserves_memory(self):
+        admission = self.scheduler(10, maxBypass=1)
+        pending = self.pending(("a", 6), ("b", 6), ("c", 3), ("d", 1))
+        admission.admit(pending)
+        # b was bypassed by c once, d has to wait behind it
+        self.assertEqual(self.pool.started, ["a", "c"])
+
+        self.pool.finish("a")
+        admission.collect()
+        admission.admit(pending)
+        self.assertEqual(self.pool.started, ["a", "c", "b", "d"])
+
+    def test_window_bounds_started_jobs(self):
+        admission = self.scheduler(100, window=2)
+        pending = self.pending(("a", 1), ("b", 1), ("c", 1))
+        admission.admit(pending)
+        self.assertEqual(self.pool.started, ["a", "b"])
+
+    def test_too_large_job_runs_alone(self):
+        admission = self.scheduler(10)
+        pending = self.pending(("a", 20), ("b", 1))
+        admission.admit(pending)
+        self.assertEqual(self.pool.started, ["a"])
+
+    def test_imap_yields_all_results(self):
+        admission = self.scheduler(10, immediate=True)
+        jobs = [((name,), memory) for name, memory in
+                [("a", 6), ("b", 6), ("c", 3), ("d", 20)]]
+
+        self.assertEqual(sorted(admission.imap(jobs)), ["a", "b", "c", "d"])
+        self.assertEqual(admission.numRunning, 0)
+        self.assertEqual(admission.usedMemory, 0)
+
+    def test_failed_job_is_raised(self):
+        def fail(name):
+            raise ValueError(name)
+        admission = self.scheduler(10, fail, immediate=True)
+        with self.assertRaises(ValueError):
+            list(admission.imap([(("a",), 1)]))
+
+
+class DeclaredMemoryTest(unittest.TestCase):
+    def test_largest_declared_limit(self):
+        config = {"%limits": {"RLIMIT_AS": [2 ** 30, 2 ** 31],
+                              "CGROUP_MEMORY_MAX": 2 ** 29,
+                              "RLIMIT_CPU": [60, 60]}}
+        self.assertEqual(scheduler.declaredMemory(config), 2 ** 30)
+        self.assertEqual(scheduler.declaredMemory({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
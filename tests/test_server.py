@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+import unittest
+
+from .context import experimentrun
+from experimentrun import server
+
+
+def fail(context):
+    raise ValueError("broken configuration")
+
+
+def failUnpicklable(context):
+    error = ValueError("holds a lock")
+    error.lock = threading.Lock()
+    raise error
+
+
+def exit(context):
+    sys.exit(1)
+
+
+def die(context):
+    os._exit(3)
+
+
+def job(tool, v=1):
+    return {"v": v, "tools": ["tests.test_server.%s()" % (tool)]}
+
+
+class ForkJobTest(unittest.TestCase):
+    def forkJob(self, config):
+        return server.forkJob(config, os.getcwd(), os.getcwd())
+
+    def test_result_of_child(self):
+        success, result = self.forkJob(
+            {"v": 2, "tools": ["experimentrun.tools.Eval()"]})
+        self.assertTrue(success)
+        self.assertEqual(result["v"], 2)
+
+    def test_exception_of_child(self):
+        success, error = self.forkJob(job("fail"))
+        self.assertFalse(success)
+        self.assertIsInstance(error, ValueError)
+
+    def test_unpicklable_exception_keeps_traceback(self):
+        success, error = self.forkJob(job("failUnpicklable"))
+        self.assertFalse(success)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn("holds a lock", str(error))
+        self.assertIn("failUnpicklable", str(error))
+
+    def test_exit_of_child(self):
+        success, error = self.forkJob(job("exit"))
+        self.assertFalse(success)
+        self.assertIn("SystemExit", str(error))
+
+    def test_died_child(self):
+        success, error = self.forkJob(job("die"))
+        self.assertFalse(success)
+        self.assertIn("exit code 3", str(error))
+
+
+class JobDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dispatcher = server.JobDispatcher()
+
+    def runIndexed(self, key, template, index):
+        return ["runIndexed", [key, template, index, self.cwd, self.cwd]]
+
+    def test_batch_statuses(self):
+        template = {"v": {"%explode": [1, 2]},
+                    "tools": ["experimentrun.tools.Eval()"]}
+        outcomes = self.dispatcher.runBatch([
+            ["run", [job("fail"), self.cwd, self.cwd]],
+            self.runIndexed("a", template, 1),
+            self.runIndexed("a", None, 0),
+            self.runIndexed("b", None, 0)])
+
+        self.assertEqual([outcome[0] for outcome in outcomes],
+                         ["error", "ok", "ok", "unknownTemplate"])
+        self.assertIn("broken configuration", outcomes[0][1])
+        self.assertEqual([outcomes[1][1]["v"], outcomes[2][1]["v"]], [2, 1])
+
+    def test_least_recently_used_template_is_evicted(self):
+        self.dispatcher.maxTemplates = 2
+        for key in ("a", "b", "a", "c"):
+            self.dispatcher.runIndexed(key, {"v": key}, 0, self.cwd, self.cwd)
+
+        self.assertEqual(list(self.dispatcher.plans), ["a", "c"])
+        with self.assertRaises(server.UnknownTemplate):
+            self.dispatcher.runIndexed("b", None, 0, self.cwd, self.cwd)
+
+    def test_unknown_method_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.dispatcher.runBatch([["setIncludes", [["/"]]]])
+
+
+@unittest.skipUnless(server.Zygote.supported(), "needs fork")
+class ZygoteTest(unittest.TestCase):
+    def test_jobs_run_in_forked_children(self):
+        dispatcher = server.JobDispatcher(server.Zygote())
+        cwd = os.getcwd()
+        first = dispatcher.run(
+            {"v": 1, "tools": ["experimentrun.tools.Eval()"]}, cwd, cwd)
+        with self.assertRaises(ValueError):
+            dispatcher.run(job("fail"), cwd, cwd)
+        # the slot survives failing and dying jobs
+        with self.assertRaises(RuntimeError):
+            dispatcher.run(job("die"), cwd, cwd)
+        second = dispatcher.run(
+            {"v": 2, "tools": ["experimentrun.tools.Eval()"]}, cwd, cwd)
+
+        self.assertEqual([first["v"], second["v"]], [1, 2])
+        dispatcher.zygote.process.terminate()
+        dispatcher.zygote.process.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import signal
+import json
+import tempfile
+import subprocess
+import unittest
+
+from unittest import mock
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import json_names
+from experimentrun import tools
+from experimentrun import cgroups
+
+
+# the configuration interrupt stops the run at, and those it ran
+interruptAt = None
+ran = list()
+
+
+def interrupt(context):
+    if context.config["v"] == interruptAt:
+        raise KeyboardInterrupt()
+    ran.append(context.config["v"])
+
+
+def napReversed(context):
+    # later configurations finish first
+    time.sleep(0.05 * (4 - context.config["v"]))
+
+
+class ExplodeNBootstrapTest(unittest.TestCase):
+    def test_parallel_results_in_configuration_order(self):
+        config = {
+            "configurations": [{
+                "v": {"%explode": list(range(4))},
+                "tools": ["tests.test_tools.napReversed()"]}],
+            json_names.exrunConfDir.text: os.getcwd()}
+        metadata = framework.Metadata(config)
+        tool = tools.ExplodeNBootstrap(parallel=True, processors=[0] * 4)
+        tool.setup(metadata)
+        tool.run()
+
+        self.assertEqual([result["v"] for result in config["runResults"]],
+                         list(range(4)))
+
+    def test_shared_templates_are_released_once(self):
+        # the resource tracker reports segments that are leaked or
+        # unregistered twice when the process exits
+        code = ("from tests.test_tools import ExplodeNBootstrapTest; "
+                "ExplodeNBootstrapTest("
+                "'test_parallel_results_in_configuration_order').debug()")
+        process = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertNotIn("resource_tracker", process.stderr)
+        self.assertNotIn("KeyError", process.stderr)
+
+
+class RunShellTest(unittest.TestCase):
+    def test_timeout_kills_command_with_rlimits(self):
+        config = {
+            "%limits": {"timeout": 0.5, "RLIMIT_CPU": [60, 60]},
+            "tools": [
+                "experimentrun.tools.RunShell{'command': 'sleep 30', "
+                "'runInfoTo': '/info'}"]}
+        start = time.monotonic()
+        framework.bootstrap(config, os.getcwd())
+
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(config["info"]["returnCode"], -signal.SIGKILL)
+
+
+class FakeCgroup(object):
+    def __init__(self):
+        self.limits = None
+
+    def setLimits(self, **limits):
+        self.limits = limits
+
+    def joinFunction(self):
+        return (lambda: None), None
+
+    def remove(self):
+        pass
+
+
+class CgroupLimitsTest(unittest.TestCase):
+    def runShell(self, limits):
+        tool = tools.RunShell("true")
+        tool.setup(framework.Metadata({"%limits": limits}))
+        tool.loadLimits()
+        return tool
+
+    def test_limits_are_split_by_prefix(self):
+        tool = self.runShell({"timeout": 1, "RLIMIT_CPU": [1, 1],
+                              "CGROUP_MEMORY_MAX": 2 ** 20})
+        self.assertEqual(tool.limits, {"RLIMIT_CPU": [1, 1]})
+        self.assertEqual(tool.cgroupLimits, {"CGROUP_MEMORY_MAX": 2 ** 20})
+
+    def test_unknown_cgroup_limit_is_ignored(self):
+        tool = self.runShell({"CGROUP_MEMORY_MAX": 2 ** 20,
+                              "CGROUP_UNKNOWN": 1})
+        cgroup = FakeCgroup()
+        manager = mock.Mock()
+        manager.createJob.return_value = cgroup
+        with mock.patch.object(cgroups, "manager", return_value=manager), \
+                self.assertLogs(level="WARNING") as logs:
+            tool.createCgroup()
+
+        self.assertIn("CGROUP_UNKNOWN", logs.output[0])
+        self.assertEqual(cgroup.limits, {"memoryMax": 2 ** 20})
+
+    def prepared(self, configuration):
+        config = {"configurations": [configuration],
+                  json_names.exrunConfDir.text: os.getcwd()}
+        tool = tools.ExplodeNBootstrap()
+        tool.setup(framework.Metadata(config))
+        tool.templates = [configuration]
+        with mock.patch.object(cgroups, "manager") as manager:
+            tool.prepareCgroups()
+        return manager.called
+
+    def test_cgroups_are_prepared_for_exploded_limits(self):
+        self.assertFalse(self.prepared({"%limits": {"RLIMIT_CPU": [1, 1]}}))
+        self.assertTrue(self.prepared({"%limits": {"%explode": [
+            {"CGROUP_CPUS": 1}, {"CGROUP_CPUS": 2}]}}))
+
+    def test_cgroups_are_prepared_for_linked_limits(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as linked:
+            json.dump({"CGROUP_PIDS_MAX": 16}, linked)
+            linked.flush()
+            self.assertTrue(self.prepared(
+                {"%limits": {"%linkFile": linked.name}}))
+
+    def test_cgroups_are_prepared_for_relative_linked_limits(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "limits.json"), 'w') as linked:
+                json.dump({"CGROUP_PIDS_MAX": 16}, linked)
+            os.chdir(directory)
+            try:
+                self.assertTrue(self.prepared(
+                    {"%limits": {"%linkFile": "limits.json"}}))
+            finally:
+                os.chdir(cwd)
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        global interruptAt
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.directory.name, "journal")
+        self.sink = os.path.join(self.directory.name, "results.jsonl")
+        interruptAt = None
+        del ran[:]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def explode(self, resume=False, resultSink=None):
+        config = {
+            "configurations": [{"v": {"%explode": list(range(6))},
+                                "tools": ["tests.test_tools.interrupt()"]}],
+            json_names.exrunConfDir.text: os.getcwd()}
+        tool = tools.ExplodeNBootstrap(
+            journal=self.journal, resume=resume, resultSink=resultSink)
+        tool.setup(framework.Metadata(config))
+        tool.run()
+
+    def test_resume_runs_remaining_configurations(self):
+        global interruptAt
+        interruptAt = 3
+        with self.assertRaises(KeyboardInterrupt):
+            self.explode(resultSink=self.sink)
+        interruptAt = None
+        self.explode(resume=True, resultSink=self.sink)
+
+        self.assertEqual(ran, list(range(6)))
+        with open(self.sink) as sink:
+            results = [json.loads(line) for line in sink]
+        self.assertEqual([result["v"] for result in results], list(range(6)))
+
+    def test_resume_needs_persistent_sink(self):
+        self.explode()
+        with self.assertRaises(RuntimeError):
+            self.explode(resume=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from unittest import mock
+
+from .context import experimentrun
+from experimentrun import framework
+from experimentrun import topology
+from experimentrun import tools
+
+
+def machine():
+    """Two nodes with one L3 cache and two SMT cores each."""
+    cpus = list()
+    for cpu in range(8):
+        core = cpu % 4
+        node = core // 2
+        cpus.append(topology.Cpu(cpu, core, node, node, 2 * node))
+    return cpus
+
+
+class SelectCpusTest(unittest.TestCase):
+    def test_parse_cpu_list(self):
+        self.assertEqual(topology.parseCpuList("0-2,5,7-8\n"),
+                         [0, 1, 2, 5, 7, 8])
+
+    def test_spread_alternates_nodes(self):
+        selected = topology.selectCpus(2, "spread", machine())
+        self.assertEqual([cpu.cpu for cpu in selected], [0, 2])
+
+    def test_pack_fills_first_node(self):
+        selected = topology.selectCpus(2, "pack", machine())
+        self.assertEqual([cpu.cpu for cpu in selected], [0, 1])
+
+    def test_siblings_are_used_last(self):
+        selected = topology.selectCpus(None, "spread", machine())
+        self.assertEqual([cpu.cpu for cpu in selected], [0, 2, 1, 3])
+        selected = topology.selectCpus(6, "spread", machine())
+        self.assertEqual([cpu.cpu for cpu in selected[4:]], [4, 6])
+
+    def test_processors_must_not_be_bool(self):
+        tool = tools.ExplodeNBootstrap(processors=True)
+        with self.assertRaises(ValueError):
+            tool.selectProcessors()
+
+
+class BindMemoryCommandTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # records its option and runs the command like numactl
+        self.numactl = os.path.join(self.directory.name, "numactl")
+        with open(self.numactl, 'w') as script:
+            script.write('#!/bin/sh\necho "$1" > "$0.option"\n'
+                         'shift 2\nexec "$@"\n')
+        os.chmod(self.numactl, stat.S_IRWXU)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_without_numactl(self):
+        with mock.patch.object(topology, "_numactl", return_value=None):
+            self.assertEqual(topology.bindMemoryCommand(1), [])
+
+    def runCommand(self, command):
+        config = {"tools": [], "out": self.directory.name}
+        metadata = framework.Metadata(config)
+        metadata.shellNode = 1
+        tool = tools.RunShell(command, runInfoTo="/info")
+        tool.setup(metadata)
+        with mock.patch.object(topology, "_numactl",
+                               return_value=self.numactl):
+            tool.run()
+        with open(self.numactl + ".option") as option:
+            return config["info"]["returnCode"], option.read().strip()
+
+    def test_command_runs_under_numactl(self):
+        self.assertEqual(self.runCommand("true"), (0, "--preferred=1"))
+
+    def test_bash_command_runs_under_numactl(self):
+        self.assertEqual(
+            self.runCommand("test -d ${/out} && exit 0 || exit 1"),
+            (0, "--preferred=1"))
+
+
+if __name__ == '__main__':
+    unittest.main()